@@ -10,6 +10,9 @@ python manage.py collectstatic --no-input
 echo "Running migrations..."
 python manage.py migrate
 
+echo "Training ML models..."
+python manage.py train_models
+
 echo "Creating superuser if it doesn't exist..."
 python manage.py shell -c "
 from django.contrib.auth import get_user_model;
@@ -0,0 +1,91 @@
+"""Cached dashboard payloads, invalidated by the signal handlers in evaluation.signals
+
+Each payload is the plain context a dashboard view renders, keyed by kind and the
+owning user (or form and reviewee). A generation number in every key lets changes that
+touch every dashboard (e.g. a new employee) drop them all at once.
+"""
+import time
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+
+ADMIN_DASHBOARD = 'admin'
+EMPLOYEE_DASHBOARD = 'employee'
+FORM_REVIEWS = 'reviews'  # The reviews one employee received on a form, keyed by reviews_key
+KINDS = [ADMIN_DASHBOARD, EMPLOYEE_DASHBOARD, FORM_REVIEWS]
+
+GENERATION_KEY = 'dashboard:generation'
+
+
+def _generation():
+    # Seeded from the clock, so a generation evicted from the cache never restarts at an old value
+    return cache.get_or_set(GENERATION_KEY, time.time_ns, None)
+
+
+def reviews_key(form_id, reviewee_id):
+    return f'{form_id}-{reviewee_id}'
+
+
+def _key(kind, object_id, generation):
+    return f'dashboard:{kind}:{object_id}:{generation}'
+
+
+def _count(kind, outcome):
+    key = f'dashboard:stats:{kind}:{outcome}'
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, None)
+
+
+def cached_payload(kind, object_id, build):
+    """Return the cached payload for (kind, object_id), building and storing it on a miss"""
+    timeout = getattr(settings, 'DASHBOARD_CACHE_TIMEOUT', 300)
+    # Invalidations from workers and other web processes never reach a per-process cache
+    if not timeout or isinstance(caches['default'], LocMemCache):
+        return build()
+
+    key = _key(kind, object_id, _generation())
+    payload = cache.get(key)
+    if payload is not None:
+        _count(kind, 'hits')
+        return payload
+
+    _count(kind, 'misses')
+    payload = build()
+    cache.set(key, payload, timeout)
+    return payload
+
+
+def invalidate(kind, object_ids):
+    """Drop the cached payloads of kind for object_ids once the current transaction commits
+
+    Deleting on commit stops a concurrent request re-caching the data being replaced.
+    """
+    object_ids = {object_id for object_id in object_ids if object_id is not None}
+    if object_ids:
+        transaction.on_commit(lambda: cache.delete_many([
+            _key(kind, object_id, _generation()) for object_id in object_ids
+        ]))
+
+
+def invalidate_all():
+    """Drop every cached dashboard once the current transaction commits"""
+    def bump():
+        try:
+            cache.incr(GENERATION_KEY)
+        except ValueError:
+            cache.set(GENERATION_KEY, time.time_ns(), None)
+    transaction.on_commit(bump)
+
+
+def cache_stats():
+    """{kind: {'hits', 'misses'}} since the cache was last cleared"""
+    return {
+        kind: {
+            outcome: cache.get(f'dashboard:stats:{kind}:{outcome}', 0)
+            for outcome in ('hits', 'misses')
+        }
+        for kind in KINDS
+    }
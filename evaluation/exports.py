@@ -0,0 +1,73 @@
+"""Streaming exports of a form's peer reviews with their answers and ML results flattened per question"""
+import csv
+import json
+from .models import PeerReview
+
+EXPORT_FORMATS = ['csv', 'jsonl']
+EXPORT_CHUNK_SIZE = 2000  # Reviews fetched per database round trip
+ANSWER_FIELDS = ['answer', 'category', 'prediction', 'confidence', 'error']
+# Leading characters that make spreadsheet applications evaluate a cell as a formula
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+class _Echo:
+    """File-like object whose write returns the line, so csv.writer can feed a generator"""
+    def write(self, value):
+        return value
+
+
+def escape_formula(value):
+    """Prefix text cells that a spreadsheet would run as a formula with a quote"""
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return f"'{value}"
+    return value
+
+
+def export_columns(form):
+    columns = ['review_id', 'reviewer', 'reviewee', 'submitted_at', 'ml_status']
+    for index in range(1, len(form.questions) + 1):
+        columns += [f'q{index}_{field}' for field in ANSWER_FIELDS]
+    return columns
+
+
+def export_rows(form, chunk_size=EXPORT_CHUNK_SIZE):
+    """One flat dict per review of form, read with a server-side iterator in id order"""
+    questions = [question['text'] for question in form.questions]
+    reviews = (
+        PeerReview.objects
+        .filter(form=form)
+        .order_by('id')
+        .values_list('id', 'reviewer__username', 'reviewee__username', 'submitted_at', 'ml_status', 'responses', 'ml_analysis')
+    )
+    for review_id, reviewer, reviewee, submitted_at, ml_status, responses, ml_analysis in reviews.iterator(chunk_size=chunk_size):
+        row = {
+            'review_id': review_id,
+            'reviewer': reviewer,
+            'reviewee': reviewee,
+            'submitted_at': submitted_at.isoformat(),
+            'ml_status': ml_status,
+        }
+        for index, question in enumerate(questions, 1):
+            result = (ml_analysis or {}).get(question)
+            if not isinstance(result, dict):
+                result = {}
+            row[f'q{index}_answer'] = (responses or {}).get(question, '')
+            for field in ANSWER_FIELDS[1:]:
+                row[f'q{index}_{field}'] = result.get(field, '')
+        yield row
+
+
+def stream_export(form, export_format, chunk_size=EXPORT_CHUNK_SIZE):
+    """Yield the export of form as text lines, starting with the header for CSV"""
+    if export_format == 'csv':
+        columns = export_columns(form)
+        writer = csv.DictWriter(_Echo(), fieldnames=columns)
+        yield writer.writerow(dict(zip(columns, columns)))
+        for row in export_rows(form, chunk_size):
+            # Answers are free text typed by employees; JSONL consumers get them unchanged
+            yield writer.writerow({column: escape_formula(value) for column, value in row.items()})
+    elif export_format == 'jsonl':
+        for row in export_rows(form, chunk_size):
+            yield json.dumps(row, ensure_ascii=False) + '\n'
+    else:
+        raise ValueError(f'Unknown export format {export_format!r}, expected one of {EXPORT_FORMATS}')
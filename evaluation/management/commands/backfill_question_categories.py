@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+from evaluation.models import EvaluationForm
+from evaluation.ml_models.analysis import classify_questions
+
+
+class Command(BaseCommand):
+    help = 'Store the predicted category and confidence on the questions of existing forms'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Reclassify questions that already have a category')
+
+    def handle(self, *args, **options):
+        updated_forms = 0
+        updated_questions = 0
+
+        for form in EvaluationForm.objects.all().iterator():
+            questions = form.questions or []
+            classified = classify_questions(questions, force=options['force'])
+            if classified:
+                form.questions = questions
+                form.save(update_fields=['questions'])
+                updated_forms += 1
+                updated_questions += classified
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Classified {updated_questions} questions across {updated_forms} forms'
+        ))
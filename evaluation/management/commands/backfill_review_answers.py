@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+from evaluation.models import PeerReview
+from evaluation.tasks import store_review_answers
+
+
+class Command(BaseCommand):
+    help = 'Write the ReviewAnswer rows of reviews analysed before the table existed'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--form', type=int, dest='form_id', help='Only backfill this EvaluationForm id')
+        parser.add_argument('--batch-size', type=int, default=500, help='Reviews written per transaction')
+
+    def handle(self, *args, **options):
+        reviews = (
+            PeerReview.objects
+            .filter(ml_status='done')
+            .select_related('form')
+            .only('id', 'form_id', 'reviewee_id', 'ml_analysis', 'form__questions')
+            .order_by('id')
+        )
+        if options['form_id']:
+            reviews = reviews.filter(form_id=options['form_id'])
+
+        batch = []
+        backfilled_reviews = 0
+        backfilled_answers = 0
+        for review in reviews.iterator(chunk_size=options['batch_size']):
+            batch.append(review)
+            if len(batch) == options['batch_size']:
+                backfilled_answers += store_review_answers(batch)
+                backfilled_reviews += len(batch)
+                batch = []
+        if batch:
+            backfilled_answers += store_review_answers(batch)
+            backfilled_reviews += len(batch)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Wrote {backfilled_answers} answers for {backfilled_reviews} reviews'
+        ))
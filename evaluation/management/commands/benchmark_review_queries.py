@@ -0,0 +1,119 @@
+import math
+import random
+import time
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from evaluation.models import CustomUser, EvaluationForm, PeerReview
+
+# Indexes added for the hot review queries, compared against the plans without them
+BENCHMARKED_INDEXES = [
+    (CustomUser, 'user_role_idx'),
+    (EvaluationForm, 'form_owner_created_idx'),
+    (PeerReview, 'peerreview_form_reviewee_idx'),
+]
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Time the hot review queries and show their query plans on generated data, with and without '
+        'the review access indexes. Everything runs in one transaction that is rolled back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reviews', type=int, default=100000, help='Peer reviews to generate')
+        parser.add_argument('--team-size', type=int, default=40, help='Employees assigned to each form')
+        parser.add_argument('--repeat', type=int, default=50, help='Runs per query when timing')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                queries = self.generate_data(options)
+                self.run_queries(queries, options['repeat'], 'With indexes')
+
+                if connection.features.can_rollback_ddl:
+                    # Plain DROP INDEX: SQLite's schema editor refuses to run inside a transaction
+                    with connection.cursor() as cursor:
+                        for model, name in BENCHMARKED_INDEXES:
+                            cursor.execute(f'DROP INDEX {connection.ops.quote_name(name)}')
+                    self.run_queries(queries, options['repeat'], 'Without indexes')
+                else:
+                    self.stdout.write(self.style.WARNING(f'{connection.vendor} cannot roll back DDL, skipping the run without indexes'))
+                raise Rollback
+        except Rollback:
+            self.stdout.write('Generated data rolled back')
+
+    def generate_data(self, options):
+        random.seed(options['seed'])
+        team_size = options['team_size']
+        form_count = max(1, math.ceil(options['reviews'] / (team_size * (team_size - 1))))
+        started = time.monotonic()
+
+        admin = CustomUser.objects.create(username='benchmark-admin', role='admin', password='!')
+        employees = CustomUser.objects.bulk_create([
+            CustomUser(username=f'benchmark-employee-{i}', role='employee', password='!')
+            for i in range(team_size * 5)
+        ])
+        forms = EvaluationForm.objects.bulk_create([
+            EvaluationForm(title=f'Benchmark form {i}', questions=[{'text': 'How punctual is this colleague?'}], created_by=admin)
+            for i in range(form_count)
+        ])
+
+        assignments, reviews = [], []
+        for form in forms:
+            team = random.sample(employees, team_size)
+            assignments.extend(
+                EvaluationForm.assigned_employees.through(evaluationform_id=form.id, customuser_id=employee.id)
+                for employee in team
+            )
+            for reviewer in team:
+                for reviewee in team:
+                    if reviewer.id != reviewee.id and len(reviews) < options['reviews']:
+                        reviews.append(PeerReview(
+                            form=form,
+                            reviewer=reviewer,
+                            reviewee=reviewee,
+                            responses={'How punctual is this colleague?': 'Always on time'},
+                            ml_status='done'
+                        ))
+        EvaluationForm.assigned_employees.through.objects.bulk_create(assignments, batch_size=5000)
+        PeerReview.objects.bulk_create(reviews, batch_size=5000)
+        # Give the planner statistics, as a maintained production database would have
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+        self.stdout.write(
+            f'Generated {len(reviews)} reviews on {form_count} forms in {time.monotonic() - started:.1f}s'
+        )
+
+        form = forms[len(forms) // 2]
+        reviewee = random.choice(list(form.assigned_employees.all()))
+        return [
+            ('PeerReview(form, reviewee)', lambda: PeerReview.objects.filter(form=form, reviewee=reviewee)),
+            ('EvaluationForm(created_by) newest first', lambda: EvaluationForm.objects.filter(created_by=admin).order_by('-created_at')[:20]),
+            ('CustomUser(role)', lambda: CustomUser.objects.filter(role='admin')),
+        ]
+
+    def run_queries(self, queries, repeat, label):
+        self.stdout.write(self.style.MIGRATE_HEADING(label))
+        for name, build in queries:
+            started = time.perf_counter()
+            for _ in range(repeat):
+                list(build())
+            elapsed = (time.perf_counter() - started) / repeat * 1000
+
+            self.stdout.write(f'  {name}: {elapsed:.2f} ms')
+            for line in self.explain(build(), label):
+                self.stdout.write(f'    {line}')
+
+    def explain(self, queryset, label):
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            # The label makes the statement unique per run; SQLite would otherwise reuse the
+            # EXPLAIN it cached before the indexes were dropped
+            cursor.execute(f'{connection.ops.explain_query_prefix()} {sql} /* {label} */', params)
+            return [' '.join(str(column) for column in row) for row in cursor.fetchall()]
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from evaluation.dashboard_cache import cache_stats
+
+
+class Command(BaseCommand):
+    help = 'Show dashboard cache hits and misses, counted in the shared cache (CACHE_DIR)'
+
+    def handle(self, *args, **options):
+        for kind, stats in cache_stats().items():
+            lookups = stats['hits'] + stats['misses']
+            hit_rate = f'{stats["hits"] / lookups:.0%}' if lookups else '-'
+            self.stdout.write(f'{kind}: {stats["hits"]} hits, {stats["misses"]} misses ({hit_rate} hit rate)')
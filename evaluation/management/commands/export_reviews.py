@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+from evaluation.exports import EXPORT_CHUNK_SIZE, EXPORT_FORMATS, stream_export
+from evaluation.models import EvaluationForm
+
+
+class Command(BaseCommand):
+    help = 'Export every review of a form with its answers and ML results as CSV or JSONL'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--form', type=int, dest='form_id', required=True, help='EvaluationForm id')
+        parser.add_argument('--format', choices=EXPORT_FORMATS, default='csv')
+        parser.add_argument('--output', help='File to write, standard output by default')
+        parser.add_argument('--chunk-size', type=int, default=EXPORT_CHUNK_SIZE, help='Reviews fetched per query round trip')
+
+    def handle(self, *args, **options):
+        try:
+            form = EvaluationForm.objects.get(id=options['form_id'])
+        except EvaluationForm.DoesNotExist:
+            raise CommandError(f"Form {options['form_id']} does not exist")
+
+        lines = stream_export(form, options['format'], options['chunk_size'])
+        if not options['output']:
+            for line in lines:
+                self.stdout.write(line, ending='')
+            return
+
+        with open(options['output'], 'w', encoding='utf-8', newline='') as output:
+            for line in lines:
+                output.write(line)
+        self.stderr.write(self.style.SUCCESS(f"Exported form {form.id} to {options['output']}"))
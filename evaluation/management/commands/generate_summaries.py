@@ -0,0 +1,70 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from evaluation.models import EvaluationForm
+from evaluation.tasks import queue_form_summaries, claim_summaries, submit_summary
+from evaluation.ml_models.llm import set_llm_rate_limit
+
+
+class Command(BaseCommand):
+    help = 'Generate the performance summaries of every employee whose reviews are complete on a form'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--form', type=int, required=True, dest='form_id', help='EvaluationForm id')
+        parser.add_argument('--concurrency', type=int, default=getattr(settings, 'SUMMARY_WORKER_THREADS', 4), help='Concurrent LLM calls')
+        parser.add_argument('--rate', type=float, default=getattr(settings, 'SUMMARY_RATE_PER_MINUTE', 30), help='Maximum LLM calls per minute (0 disables the limit)')
+        parser.add_argument('--force', action='store_true', help='Regenerate summaries that are already up to date')
+
+    def handle(self, *args, **options):
+        try:
+            form = EvaluationForm.objects.get(id=options['form_id'])
+        except EvaluationForm.DoesNotExist:
+            raise CommandError(f"Form {options['form_id']} does not exist")
+
+        queued, generating, up_to_date = queue_form_summaries(form, force=options['force'])
+        self.stdout.write(
+            f'{form.title}: {len(queued)} newly queued, {len(generating)} already pending or running, '
+            f'{len(up_to_date)} up to date'
+        )
+
+        # Summaries queued earlier, e.g. when the last review came in, are generated here too
+        pending = queued + generating
+        summaries = claim_summaries(len(pending), summary_ids=[summary.id for summary in pending])
+        if len(summaries) < len(pending):
+            self.stdout.write(
+                f'{len(pending) - len(summaries)} summaries are being generated by a running worker or are waiting to retry'
+            )
+        if not summaries:
+            return
+
+        set_llm_rate_limit(options['rate'])
+        total = len(summaries)
+        done = 0
+        failed = 0
+
+        # The pool only runs the LLM round-trips, rate-limited by the client
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as pool:
+            submitted = {}
+            for summary in summaries:
+                # The LLM client already retried transient errors, so a failure here is final for this run
+                submission = submit_summary(pool, summary, max_attempts=1)
+                if submission is None:
+                    done += 1
+                    failed += 1
+                    self.stdout.write(self.style.WARNING(f'[{done}/{total}] No reviews found for {summary.employee.username}'))
+                    continue
+                future, finish = submission
+                submitted[future] = (summary, finish)
+
+            for future in as_completed(submitted):
+                summary, finish = submitted[future]
+                done += 1
+                if finish():
+                    self.stdout.write(f'[{done}/{total}] Generated summary for {summary.employee.username}')
+                else:
+                    failed += 1
+                    self.stdout.write(self.style.WARNING(
+                        f'[{done}/{total}] Failed for {summary.employee.username}: {summary.last_error}'
+                    ))
+
+        self.stdout.write(self.style.SUCCESS(f'Finished: {total - failed} generated, {failed} failed'))
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from evaluation.models import EvaluationForm
+from evaluation.tasks import refresh_score_rollups
+
+
+class Command(BaseCommand):
+    help = 'Recompute the per-employee score rollups shown on the performance output pages'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--form', type=int, dest='form_id', help='Only rebuild this EvaluationForm id')
+
+    def handle(self, *args, **options):
+        forms = EvaluationForm.objects.all()
+        if options['form_id']:
+            forms = forms.filter(id=options['form_id'])
+
+        rebuilt_forms = 0
+        rebuilt_employees = 0
+        for form_id in forms.values_list('id', flat=True).iterator():
+            rebuilt_employees += refresh_score_rollups(form_id)
+            rebuilt_forms += 1
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt scores for {rebuilt_employees} employees across {rebuilt_forms} forms'
+        ))
@@ -0,0 +1,29 @@
+import time
+from django.core.management.base import BaseCommand
+from evaluation.tasks import run_ml_jobs, release_stale_ml_jobs, ML_JOB_MAX_ATTEMPTS
+
+
+class Command(BaseCommand):
+    help = 'Process queued ML analysis jobs for submitted peer reviews'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=50, help='Reviews analysed per batch')
+        parser.add_argument('--sleep', type=float, default=2.0, help='Seconds to wait when the queue is empty')
+        parser.add_argument('--max-attempts', type=int, default=ML_JOB_MAX_ATTEMPTS, help='Attempts before a job is marked failed')
+        parser.add_argument('--once', action='store_true', help='Drain the queue once and exit')
+
+    def handle(self, *args, **options):
+        released = release_stale_ml_jobs()
+        if released:
+            self.stdout.write(f'Requeued {released} stale jobs')
+
+        while True:
+            processed = run_ml_jobs(options['batch_size'], options['max_attempts'])
+            if processed:
+                self.stdout.write(f'Analysed {processed} reviews')
+                continue
+
+            if options['once']:
+                break
+            time.sleep(options['sleep'])
+            release_stale_ml_jobs()
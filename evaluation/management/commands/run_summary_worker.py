@@ -0,0 +1,54 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from evaluation.tasks import claim_summaries, submit_summary, release_stale_summaries, SUMMARY_MAX_ATTEMPTS
+from evaluation.ml_models.llm import set_llm_rate_limit
+
+
+class Command(BaseCommand):
+    help = 'Generate queued employee performance summaries with a bounded pool of concurrent LLM calls'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=getattr(settings, 'SUMMARY_WORKER_THREADS', 4), help='Concurrent LLM calls')
+        parser.add_argument('--rate', type=float, default=getattr(settings, 'SUMMARY_RATE_PER_MINUTE', 30), help='Maximum LLM calls per minute (0 disables the limit)')
+        parser.add_argument('--sleep', type=float, default=2.0, help='Seconds to wait when the queue is empty')
+        parser.add_argument('--max-attempts', type=int, default=SUMMARY_MAX_ATTEMPTS, help='Attempts before a summary is marked failed')
+        parser.add_argument('--once', action='store_true', help='Drain the queue once and exit')
+
+    def handle(self, *args, **options):
+        threads = options['threads']
+        max_attempts = options['max_attempts']
+        set_llm_rate_limit(options['rate'])
+
+        released = release_stale_summaries()
+        if released:
+            self.stdout.write(f'Requeued {released} stale summaries')
+
+        # Database work stays on this thread; the pool only runs the LLM round-trips
+        in_flight = {}
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            while True:
+                for summary in claim_summaries(threads - len(in_flight)):
+                    # The LLM client retries transient errors; anything else goes back through the queue
+                    submission = submit_summary(pool, summary, max_attempts)
+                    if submission is not None:
+                        future, finish = submission
+                        in_flight[future] = (summary, finish)
+
+                if not in_flight:
+                    if options['once']:
+                        break
+                    time.sleep(options['sleep'])
+                    release_stale_summaries()
+                    continue
+
+                done, _ = wait(in_flight, timeout=options['sleep'], return_when=FIRST_COMPLETED)
+                for future in done:
+                    summary, finish = in_flight.pop(future)
+                    if finish():
+                        self.stdout.write(f'Generated summary for {summary.employee.username} ({summary.form.title})')
+                    else:
+                        self.stdout.write(self.style.WARNING(
+                            f'Summary for {summary.employee.username} failed (attempt {summary.attempts}): {summary.last_error}'
+                        ))
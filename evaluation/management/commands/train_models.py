@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand
+from evaluation.ml_models import registry
+from evaluation.ml_models.genprocess import Brain, invalidate_pipeline_cache
+from evaluation.ml_models.qpsvc import question_dataset_path, train_question_classifier
+
+
+class Command(BaseCommand):
+    help = 'Train the question classifier and every per-category answer model and save them as a versioned artifact set'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--model-version', dest='model_version', help='Artifact version name (defaults to a timestamp)')
+
+    def handle(self, *args, **options):
+        brain = Brain()
+        models = {}
+
+        self.stdout.write('Training question classifier...')
+        models[registry.QUESTION_CLASSIFIER] = train_question_classifier()
+
+        # Parse the answer dataset once and fit every category column from it
+        df = brain.load_dataset()
+        for column in df.columns:
+            column = column.strip()
+            self.stdout.write(f'Training category model: {column}')
+            models[registry.category_model_name(column)] = brain.train(column, df=df)
+
+        version = registry.save_models(
+            models,
+            version=options.get('model_version'),
+            metadata={
+                registry.QUESTION_DATASET_HASH: registry.file_sha256(question_dataset_path()),
+                registry.ANSWER_DATASET_HASH: registry.file_sha256(brain.csv_path),
+            }
+        )
+        # Pipelines this process fitted on the fly are superseded by the saved ones
+        invalidate_pipeline_cache()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Saved {len(models)} models as version {version} in {registry.get_artifact_root()}'
+        ))
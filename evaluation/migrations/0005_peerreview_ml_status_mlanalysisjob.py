@@ -0,0 +1,43 @@
+# Generated by Django 4.2.7 on 2026-10-18 10:27
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+def mark_existing_reviews_done(apps, schema_editor):
+    # Reviews saved before the queue existed were analysed inline
+    PeerReview = apps.get_model('evaluation', 'PeerReview')
+    PeerReview.objects.update(ml_status='done')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('evaluation', '0004_employeesummary'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='peerreview',
+            name='ml_status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('done', 'Done'), ('failed', 'Failed')], default='pending', max_length=10),
+        ),
+        migrations.RunPython(mark_existing_reviews_done, migrations.RunPython.noop),
+        migrations.CreateModel(
+            name='MLAnalysisJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], default='pending', max_length=10)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('last_error', models.TextField(blank=True)),
+                ('run_after', models.DateTimeField(default=django.utils.timezone.now)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('review', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='ml_job', to='evaluation.peerreview')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'run_after'], name='evaluation__status_f1b860_idx')],
+            },
+        ),
+    ]
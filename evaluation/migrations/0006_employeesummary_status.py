@@ -0,0 +1,46 @@
+# Generated by Django 4.2.7 on 2026-10-18 10:28
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+def mark_existing_summaries_ready(apps, schema_editor):
+    # Summaries generated before the queue existed are done; empty ones stay queued
+    EmployeeSummary = apps.get_model('evaluation', 'EmployeeSummary')
+    EmployeeSummary.objects.exclude(gemini_analysis='').update(status='ready')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('evaluation', '0005_peerreview_ml_status_mlanalysisjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='employeesummary',
+            name='attempts',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='employeesummary',
+            name='last_error',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name='employeesummary',
+            name='run_after',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddField(
+            model_name='employeesummary',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('running', 'Generating'), ('ready', 'Ready'), ('failed', 'Failed')], default='pending', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='employeesummary',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.RunPython(mark_existing_summaries_ready, migrations.RunPython.noop),
+    ]
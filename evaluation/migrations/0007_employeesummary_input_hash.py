@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-18 10:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('evaluation', '0006_employeesummary_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='employeesummary',
+            name='input_hash',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='employeesummary',
+            name='prompt_version',
+            field=models.CharField(blank=True, max_length=50),
+        ),
+    ]
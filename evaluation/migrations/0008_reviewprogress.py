@@ -0,0 +1,57 @@
+# Generated by Django 4.2.7 on 2026-10-18 10:41
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_review_progress(apps, schema_editor):
+    # Same counting as ReviewProgress.rebuild, which historical models do not have
+    EvaluationForm = apps.get_model('evaluation', 'EvaluationForm')
+    PeerReview = apps.get_model('evaluation', 'PeerReview')
+    ReviewProgress = apps.get_model('evaluation', 'ReviewProgress')
+
+    rows = []
+    for form in EvaluationForm.objects.all():
+        assigned_ids = set(form.assigned_employees.values_list('id', flat=True))
+        completed = dict(
+            PeerReview.objects
+            .filter(form=form, reviewer_id__in=assigned_ids, reviewee_id__in=assigned_ids)
+            .exclude(reviewer_id=models.F('reviewee_id'))
+            .values('reviewee_id')
+            .annotate(completed=models.Count('id'))
+            .values_list('reviewee_id', 'completed')
+        )
+        for reviewee_id in assigned_ids:
+            rows.append(ReviewProgress(
+                form=form,
+                reviewee_id=reviewee_id,
+                expected=len(assigned_ids) - 1,
+                completed=completed.get(reviewee_id, 0)
+            ))
+    ReviewProgress.objects.bulk_create(rows, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('evaluation', '0007_employeesummary_input_hash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReviewProgress',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('expected', models.PositiveIntegerField(default=0)),
+                ('completed', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('form', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='review_progress', to='evaluation.evaluationform')),
+                ('reviewee', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='review_progress', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('form', 'reviewee')},
+            },
+        ),
+        migrations.RunPython(backfill_review_progress, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.7 on 2026-10-18 10:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('evaluation', '0008_reviewprogress'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='customuser',
+            index=models.Index(fields=['role'], name='user_role_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='evaluationform',
+            index=models.Index(fields=['created_by', '-created_at'], name='form_owner_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='peerreview',
+            index=models.Index(fields=['form', 'reviewee'], name='peerreview_form_reviewee_idx'),
+        ),
+    ]
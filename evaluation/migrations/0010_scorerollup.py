@@ -0,0 +1,32 @@
+# Generated by Django 4.2.7 on 2026-10-18 10:45
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('evaluation', '0009_review_access_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScoreRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('review_count', models.PositiveIntegerField(default=0)),
+                ('answer_count', models.PositiveIntegerField(default=0)),
+                ('overall_score', models.FloatField(default=0)),
+                ('rating_counts', models.JSONField(default=dict)),
+                ('category_scores', models.JSONField(default=dict)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('employee', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='score_rollups', to=settings.AUTH_USER_MODEL)),
+                ('form', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='score_rollups', to='evaluation.evaluationform')),
+            ],
+            options={
+                'unique_together': {('form', 'employee')},
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.7 on 2026-10-18 10:47
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('evaluation', '0010_scorerollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScoreTrendPoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('category', models.CharField(blank=True, max_length=50)),
+                ('score', models.FloatField()),
+                ('answer_count', models.PositiveIntegerField(default=0)),
+                ('form_date', models.DateTimeField()),
+                ('employee', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='score_trend', to=settings.AUTH_USER_MODEL)),
+                ('form', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='score_trend', to='evaluation.evaluationform')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['employee', 'category', 'form_date'], name='trend_employee_category_idx')],
+                'unique_together': {('employee', 'form', 'category')},
+            },
+        ),
+    ]
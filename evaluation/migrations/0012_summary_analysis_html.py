@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-18 10:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('evaluation', '0011_scoretrendpoint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='employeesummary',
+            name='analysis_html',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name='employeesummary',
+            name='analysis_html_version',
+            field=models.CharField(blank=True, max_length=16),
+        ),
+    ]
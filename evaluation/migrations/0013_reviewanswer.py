@@ -0,0 +1,34 @@
+# Generated by Django 4.2.7 on 2026-10-18 10:56
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('evaluation', '0012_summary_analysis_html'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReviewAnswer',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('question_index', models.PositiveSmallIntegerField()),
+                ('category', models.CharField(blank=True, max_length=50)),
+                ('prediction', models.CharField(blank=True, max_length=100)),
+                ('confidence', models.FloatField(blank=True, null=True)),
+                ('score', models.FloatField(blank=True, null=True)),
+                ('rating', models.CharField(blank=True, max_length=20)),
+                ('form', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='review_answers', to='evaluation.evaluationform')),
+                ('review', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='answers', to='evaluation.peerreview')),
+                ('reviewee', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='review_answers', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['form', 'question_index'], name='answer_form_question_idx'), models.Index(fields=['form', 'category'], name='answer_form_category_idx'), models.Index(fields=['reviewee', 'category'], name='answer_reviewee_category_idx')],
+                'unique_together': {('review', 'question_index')},
+            },
+        ),
+    ]
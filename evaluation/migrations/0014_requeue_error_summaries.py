@@ -0,0 +1,42 @@
+from django.db import migrations
+from django.db.models import Q
+from django.utils import timezone
+
+# Texts the pre-queue code stored as the analysis when the Gemini call failed
+LEGACY_ERROR_PREFIXES = [
+    'Error processing with Gemini API',
+    'Error: File not found at path',
+    'Error: Invalid JSON format in file',
+]
+
+
+def requeue_error_summaries(apps, schema_editor):
+    # 0006 marked every non-empty analysis ready, including stored error messages
+    EmployeeSummary = apps.get_model('evaluation', 'EmployeeSummary')
+    is_error = Q()
+    for prefix in LEGACY_ERROR_PREFIXES:
+        is_error |= Q(gemini_analysis__startswith=prefix)
+    for summary in EmployeeSummary.objects.filter(is_error, status='ready'):
+        summary.last_error = summary.gemini_analysis
+        summary.gemini_analysis = ''
+        summary.analysis_html = ''
+        summary.analysis_html_version = ''
+        summary.input_hash = ''
+        summary.status = 'pending'
+        summary.attempts = 0
+        summary.run_after = timezone.now()
+        summary.save(update_fields=[
+            'last_error', 'gemini_analysis', 'analysis_html', 'analysis_html_version',
+            'input_hash', 'status', 'attempts', 'run_after', 'updated_at',
+        ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('evaluation', '0013_reviewanswer'),
+    ]
+
+    operations = [
+        migrations.RunPython(requeue_error_summaries, migrations.RunPython.noop),
+    ]
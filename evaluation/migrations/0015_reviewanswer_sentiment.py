@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 12:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('evaluation', '0014_requeue_error_summaries'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reviewanswer',
+            name='sentiment',
+            field=models.FloatField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,64 @@
+from .qpsvc import QuestionClassifier
+from .genprocess import Brain, dataset_column
+
+
+def classify_questions(questions, force=False):
+    """Store the predicted category and confidence on each form question dict
+
+    Questions that already carry a category are left alone unless force is set.
+    Returns the number of questions that were classified.
+    """
+    pending = [question for question in questions if force or 'category' not in question]
+    if not pending:
+        return 0
+
+    classified = QuestionClassifier().classify_batch([question['text'] for question in pending])
+    for question, (category, confidence) in zip(pending, classified):
+        question['category'] = category
+        question['confidence'] = float(confidence)
+    return len(pending)
+
+
+def analyze_submissions(submissions):
+    """Run the ML analysis for many submissions with one answer-model batch
+
+    submissions is a list of (questions, answers) pairs, where questions are the
+    EvaluationForm.questions dicts and answers the matching answer texts.
+    Categories precomputed at form creation are reused; only the answer models run for them.
+    Each answer is stored under the dataset column of its category.
+    Returns one PeerReview.ml_analysis dict per submission, keyed by question text.
+    Classifier and model loading errors raise; an error predicting one category is
+    stored as {'error': message} on the answers of that category.
+    """
+    # Work on copies so the forms' stored questions are not modified
+    submissions = [
+        ([dict(question) for question in questions], list(answers))
+        for questions, answers in submissions
+    ]
+    all_questions = [question for questions, answers in submissions for question in questions]
+    all_answers = [answer for questions, answers in submissions for answer in answers]
+
+    classify_questions(all_questions)
+    predictions = Brain().brain_batch([
+        (question['category'], answer) for question, answer in zip(all_questions, all_answers)
+    ])
+
+    results = []
+    offset = 0
+    for questions, answers in submissions:
+        ml_analysis = {}
+        for question, prediction in zip(questions, predictions[offset:offset + len(questions)]):
+            if isinstance(prediction, Exception):
+                ml_analysis[question['text']] = {'error': str(prediction)}
+            else:
+                ml_analysis[question['text']] = {
+                    'category': dataset_column(question['category']),
+                    'confidence': float(question['confidence']),
+                    'prediction': str(prediction)
+                }
+                # Out of Scope answers get VADER polarity scores instead of a label
+                if isinstance(prediction, dict):
+                    ml_analysis[question['text']]['sentiment'] = float(prediction['compound'])
+        results.append(ml_analysis)
+        offset += len(questions)
+    return results
@@ -1,34 +1,210 @@
-import os
-import json
-import google.generativeai as genai
+import re
+import difflib
+from concurrent.futures import ThreadPoolExecutor
 from django.conf import settings
+from .llm import get_llm_client, configured_model_name
+
+# Bump whenever the prompt below changes so cached summaries are regenerated
+PROMPT_VERSION = "1"
+
+CHARS_PER_TOKEN = 4  # Rough estimate, good enough for budgeting prompts
+NEAR_DUPLICATE_RATIO = 0.9
+NEAR_DUPLICATE_MAX_ANSWERS = 100
+MAX_REDUCE_ROUNDS = 3  # Condensing rounds before oversized digests are truncated
+
+def summary_prompt_version(model_name=None):
+    return f"{PROMPT_VERSION}/{model_name or configured_model_name()}"
+
+def estimate_tokens(text):
+    return len(text) // CHARS_PER_TOKEN + 1
+
+def _split_reviewer(answer):
+    """Split "answer (by reviewer)" into its text and reviewer"""
+    if answer.endswith(')') and ' (by ' in answer:
+        text, reviewer = answer[:-1].rsplit(' (by ', 1)
+        return text, reviewer
+    return answer, None
+
+def _normalize_answer(text):
+    return re.sub(r'[^\w\s]', '', ' '.join(text.lower().split()))
+
+def dedupe_answers(answers):
+    """Merge identical and near-identical answers, keeping every reviewer's name
+
+    "Always on time (by a)" and "always on time. (by b)" become "Always on time (by a, b)".
+    Fuzzy matching is quadratic, so above NEAR_DUPLICATE_MAX_ANSWERS answers only
+    answers that are identical after normalization are merged.
+    """
+    fuzzy = len(answers) <= NEAR_DUPLICATE_MAX_ANSWERS
+    groups = {}  # normalized -> [matcher, text, reviewers], in first-seen order
+    for answer in answers:
+        text, reviewer = _split_reviewer(answer)
+        normalized = _normalize_answer(text)
+        group = groups.get(normalized)
+        if group is None and fuzzy:
+            for candidate in groups.values():
+                # Each group's matcher keeps its own text indexed; cheapest upper bounds first
+                matcher = candidate[0]
+                matcher.set_seq1(normalized)
+                if (
+                    matcher.real_quick_ratio() >= NEAR_DUPLICATE_RATIO
+                    and matcher.quick_ratio() >= NEAR_DUPLICATE_RATIO
+                    and matcher.ratio() >= NEAR_DUPLICATE_RATIO
+                ):
+                    group = candidate
+                    break
+        if group is None:
+            group = groups[normalized] = [difflib.SequenceMatcher(None, '', normalized), text, []]
+        if reviewer:
+            group[2].append(reviewer)
+
+    return [
+        f"{text} (by {', '.join(reviewers)})" if reviewers else text
+        for matcher, text, reviewers in groups.values()
+    ]
 
 class FileProcessor:
-    def __init__(self, model_name="gemini-2.5-flash"):
-        # Get API key from environment or Django settings
-        api_key = os.environ.get("GEMINI_API_KEY") or getattr(settings, 'GEMINI_API_KEY', None)
-        if not api_key:
-            raise ValueError("GEMINI_API_KEY not found in environment variables or Django settings")
-        
-        genai.configure(api_key=api_key)
-        self.model = genai.GenerativeModel(model_name)
-
-    def process_new_file(self, file_path):
-        """Process file content with Gemini API without file upload"""
-        try:
-            # Read file content directly
-            with open(file_path, 'r', encoding='utf-8') as f:
-                file_content = f.read()
-            
-            # Parse JSON if it's a JSON file
-            if file_path.endswith('.json'):
-                data = json.loads(file_content)
-                formatted_content = self._format_peer_review_data(data)
-            else:
-                formatted_content = file_content
-            
-            # Create comprehensive analysis prompt
-            prompt = f"""
+    def __init__(self):
+        # Shared process-wide client (backend chosen by settings.LLM_BACKEND)
+        self.client = get_llm_client()
+
+    def process_data(self, data):
+        """Analyse peer review data already in memory (the dict built by build_summary_data)
+
+        LLM errors are raised, never returned as text.
+        """
+        return self.client.generate(self.build_budgeted_prompt(data))
+
+    def stream_data(self, data):
+        """Yield the analysis of peer review data in chunks as the model generates it
+
+        Errors are raised like process_data's. Only the final synthesis is streamed;
+        map-reduce passes run first.
+        """
+        return self.client.stream(self.build_budgeted_prompt(data))
+
+    def build_budgeted_prompt(self, data):
+        """Build the analysis prompt, shrinking the review data to fit SUMMARY_PROMPT_TOKEN_BUDGET
+
+        Small teams get exactly the single-pass prompt. Larger ones first have
+        near-identical answers merged; if that is still over budget, each question's
+        answers are condensed by parallel LLM calls (map) and the final prompt is
+        built from those digests (reduce), so prompt size and latency stay bounded
+        as the team grows.
+        """
+        budget = getattr(settings, 'SUMMARY_PROMPT_TOKEN_BUDGET', 8000)
+        prompt = self.build_prompt(data)
+        if not isinstance(data, dict) or estimate_tokens(prompt) <= budget:
+            return prompt
+
+        deduped = dict(data, questions=[
+            dict(question, answers=dedupe_answers(question.get('answers', [])))
+            for question in data.get('questions', [])
+        ])
+        prompt = self.build_prompt(deduped)
+        if estimate_tokens(prompt) <= budget:
+            return prompt
+
+        return self._wrap_prompt(self._format_digests(self._summarize_questions(deduped, budget)))
+
+    def _summarize_questions(self, data, budget):
+        """Map step: condense every question's answers with parallel LLM calls
+
+        Returns (question, answer count, digest) per question. A question whose answers
+        need several chunks gets one digest per chunk; if the joined digests still do
+        not fit the budget they are condensed again, up to MAX_REDUCE_ROUNDS rounds.
+        Digests still too long after that (the model kept writing long ones) are truncated,
+        so the number of LLM calls stays bounded.
+        """
+        name = data.get('name', 'Unknown')
+        questions = data.get('questions', [])
+        # Leave room in the final prompt for the instructions and every question's digest
+        chunk_budget = max(budget // 2, 500)
+        parts = [list(question.get('answers', [])) for question in questions]
+
+        for round_number in range(MAX_REDUCE_ROUNDS):
+            tasks = [
+                (index, self._map_prompt(name, questions[index].get('question', ''), chunk))
+                for index, answers in enumerate(parts)
+                for chunk in self._chunk_answers(answers, chunk_budget)
+            ]
+            condensed = [[] for question in questions]
+            for index, digest in zip([index for index, prompt in tasks], self._generate_all([prompt for index, prompt in tasks])):
+                condensed[index].append(digest.strip())
+            parts = condensed
+
+            digests = self._join_digests(questions, parts)
+            fits = estimate_tokens(self._wrap_prompt(self._format_digests(digests))) <= budget
+            if fits or all(len(question_parts) <= 1 for question_parts in parts):
+                break
+
+        if estimate_tokens(self._wrap_prompt(self._format_digests(digests))) <= budget:
+            return digests
+        return self._truncate_digests(digests, budget)
+
+    def _join_digests(self, questions, parts):
+        return [
+            (question.get('question', f'Question {i}'), len(question.get('answers', [])), '\n'.join(question_parts))
+            for i, (question, question_parts) in enumerate(zip(questions, parts), 1)
+        ]
+
+    def _truncate_digests(self, digests, budget):
+        """Cut every digest to an equal share of the budget left after the prompt's fixed text"""
+        overhead = estimate_tokens(self._wrap_prompt(self._format_digests(
+            [(question, count, '') for question, count, digest in digests]
+        )))
+        share = max(0, (budget - overhead) * CHARS_PER_TOKEN // max(len(digests), 1) - 1)
+        return [
+            (question, count, digest if len(digest) <= share else digest[:max(share - 1, 0)].rstrip() + '…')
+            for question, count, digest in digests
+        ]
+
+    def _generate_all(self, prompts):
+        """Run independent prompts concurrently, at most SUMMARY_MAP_CONCURRENCY at a time"""
+        workers = max(1, getattr(settings, 'SUMMARY_MAP_CONCURRENCY', 4))
+        with ThreadPoolExecutor(max_workers=min(workers, len(prompts) or 1)) as pool:
+            return list(pool.map(self.client.generate, prompts))
+
+    def _chunk_answers(self, answers, chunk_budget):
+        """Split answers into consecutive groups of at most chunk_budget estimated tokens"""
+        chunks, current, size = [], [], 0
+        for answer in answers:
+            tokens = estimate_tokens(answer)
+            if current and size + tokens > chunk_budget:
+                chunks.append(current)
+                current, size = [], 0
+            current.append(answer)
+            size += tokens
+        if current:
+            chunks.append(current)
+        return chunks
+
+    def _map_prompt(self, name, question, answers):
+        responses = '\n'.join(f"- {answer}" for answer in answers)
+        return f"""
+You are an expert HR analyst. Condense these peer responses about {name} for one review question into 3-6 Markdown bullet points.
+Capture the recurring themes, roughly how many reviewers share each view, and any specific comments worth quoting.
+Never mention reviewer names.
+
+QUESTION: {question}
+PEER RESPONSES:
+{responses}
+"""
+
+    def _format_digests(self, digests):
+        formatted = ""
+        for i, (question, count, digest) in enumerate(digests, 1):
+            formatted += f"QUESTION {i}: {question}\n"
+            formatted += f"SUMMARY OF {count} PEER RESPONSES:\n{digest}\n\n"
+        return formatted
+
+    def build_prompt(self, data):
+        """Wrap peer review data (a summary dict or plain text) in the analysis prompt"""
+        return self._wrap_prompt(self._format_peer_review_data(data))
+
+    def _wrap_prompt(self, formatted_content):
+        # Create comprehensive analysis prompt
+        return f"""
 You are an expert HR analyst. Analyze this employee peer review data and provide a comprehensive performance summary.
 
 PEER REVIEW DATA:
@@ -72,17 +248,6 @@ By focusing on enhancing consistent communication, ensuring reliable punctuality
             
 speak like a human by taking names of the employee you are evaluating you can also mention comments but never reveal which employee comented that keep everyones name confidential.
             """
-            
-            # Generate response
-            response = self.model.generate_content(prompt)
-            return response.text
-            
-        except FileNotFoundError:
-            return f"Error: File not found at path {file_path}"
-        except json.JSONDecodeError as e:
-            return f"Error: Invalid JSON format in file - {str(e)}"
-        except Exception as e:
-            return f"Error processing with Gemini API: {str(e)}"
     
     def _format_peer_review_data(self, data):
         """Format JSON peer review data for better analysis"""
@@ -104,9 +269,3 @@ speak like a human by taking names of the employee you are evaluating you can al
             formatted += "\n"
         
         return formatted
-
-# For backward compatibility
-def process_file(file_path):
-    """Legacy function for backward compatibility"""
-    processor = FileProcessor()
-    return processor.process_new_file(file_path)
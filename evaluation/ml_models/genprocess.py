@@ -1,15 +1,102 @@
 import pandas as pd
 import os
+import threading
+from cachetools import LRUCache
 from django.conf import settings
 from sklearn.model_selection import train_test_split
 from sklearn.pipeline import Pipeline
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.svm import LinearSVC
 from nltk.sentiment import SentimentIntensityAnalyzer
+from . import registry
+
+# Train/test split seed used for each category column
+CATEGORY_RANDOM_STATES = {
+    'Ease_of_Working_Together': 7374,
+    'Cooperation': 48482,
+    'Work_Ethics': 15053,
+    'Areas_to_Improve': 28509,
+    'Helps_Others': 563,
+    'Punctuality': 6758,
+    'Work_Efficiency': 33691,
+    'Problem_Solving': 1475,
+    'Adaptability': 4633,
+    'Communication': 10425,
+    'Innovation': 5086,
+    'Leadership': 1237,
+    'Self_Motivation': 1643,
+    'Emotional_Intelligence': 18730
+}
+
+# Question classifier labels that differ from the dataset column of the same category
+CLASSIFIER_LABEL_COLUMNS = {'Help_Others': 'Helps_Others'}
+
+# Fitted pipelines keyed by (category column, dataset mtime, model version), shared by every Brain in the process
+_pipeline_cache = LRUCache(maxsize=getattr(settings, 'ML_PIPELINE_CACHE_SIZE', 16))
+_pipeline_cache_lock = threading.Lock()
+
+
+def invalidate_pipeline_cache():
+    """Drop every cached pipeline, e.g. after the dataset or trained artifacts change"""
+    with _pipeline_cache_lock:
+        _pipeline_cache.clear()
+
+
+def dataset_column(category):
+    """Dataset column holding the answers for a question classifier category"""
+    category = category.strip()
+    return CLASSIFIER_LABEL_COLUMNS.get(category, category)
+
 
 class Brain:
     def __init__(self):
         self.base_path = os.path.join(settings.BASE_DIR, 'evaluation', 'data')
+        self.csv_path = os.path.join(self.base_path, 'prodvi-dataset-new4.csv')
+
+    def load_dataset(self):
+        return pd.read_csv(self.csv_path)
+
+    def train(self, column, df=None):
+        """Fit the answer model for one category column, None if the column is unknown"""
+        if df is None:
+            df = self.load_dataset()
+
+        column = column.strip()
+
+        if column not in df.columns:
+            return None
+
+        # Rows without a "(Label)" suffix cannot be trained on
+        split = df[column].str.split('(', expand=True).dropna()
+        x = split[0]
+        y = split[1].str.replace(')', '')
+
+        random_state = CATEGORY_RANDOM_STATES.get(column, 42)
+
+        X_train, X_test, y_train, y_test = train_test_split(x, y, test_size=0.3, random_state=random_state)
+
+        pipeSVC = Pipeline([('tfidf', TfidfVectorizer()), ('clf', LinearSVC(dual=False))])
+        pipeSVC.fit(X_train, y_train)
+        return pipeSVC
+
+    def get_pipeline(self, column):
+        """Fitted pipeline for a category, None when the dataset has no such column"""
+        column = dataset_column(column)
+        # A new dataset mtime or trained version gives a new key, so stale fits are never served
+        # and simply age out of the LRU. Unknown columns are cached as None so they are not
+        # looked up in the CSV again.
+        key = (column, os.path.getmtime(self.csv_path), registry.active_version())
+
+        with _pipeline_cache_lock:
+            if key in _pipeline_cache:
+                return _pipeline_cache[key]
+
+            pipeline = registry.load_model(
+                registry.category_model_name(column),
+                dataset_path=self.csv_path
+            ) or self.train(column)
+            _pipeline_cache[key] = pipeline
+            return pipeline
 
     def brain(self, column, comment):
         if column == "Out of Scope":
@@ -17,44 +104,42 @@ class Brain:
             print(score)
             return score
         else:
-            csv_path = os.path.join(self.base_path, 'prodvi-dataset-new4.csv')
-            df = pd.read_csv(csv_path)
-            
-            column = column.strip()
-            
-            if column not in df.columns:
+            pipeSVC = self.get_pipeline(column)
+
+            if pipeSVC is None:
                 print(f"Column {column} not found in dataset")
                 return "Column not found in dataset"
-            
-            df[['Text', 'Label']] = df[column].str.split('(', expand=True)
-            df['Label'] = df['Label'].str.replace(')', '')
-            
-            x = df['Text']
-            y = df['Label']
-            
-            columnlist = {
-                'Ease_of_Working_Together': 7374,
-                'Cooperation': 48482,
-                'Work_Ethics': 15053,
-                'Areas_to_Improve': 28509,
-                'Helps_Others': 563,
-                'Punctuality': 6758,
-                'Work_Efficiency': 33691,
-                'Problem_Solving': 1475,
-                'Adaptability': 4633,
-                'Communication': 10425,
-                'Innovation': 5086,
-                'Leadership': 1237,
-                'Self_Motivation': 1643,
-                'Emotional_Intelligence': 18730
-            }
-            
-            random_state = columnlist.get(column, 42)
-            
-            X_train, X_test, y_train, y_test = train_test_split(x, y, test_size=0.3, random_state=random_state)
-            
-            pipeSVC = Pipeline([('tfidf', TfidfVectorizer()), ('clf', LinearSVC(dual=False))])
-            pipeSVC.fit(X_train, y_train)
-            
+
             prediction = pipeSVC.predict([comment])
             return prediction[0]
+
+    def brain_batch(self, items):
+        """Predict many (column, comment) pairs with one predict call per column
+
+        Returns one entry per item in input order: the prediction, or the exception
+        raised while predicting that item's column.
+        """
+        results = [None] * len(items)
+        groups = {}
+        for index, (column, comment) in enumerate(items):
+            groups.setdefault(column, []).append(index)
+
+        for column, indexes in groups.items():
+            comments = [items[i][1] for i in indexes]
+            try:
+                if column == "Out of Scope":
+                    analyzer = SentimentIntensityAnalyzer()
+                    predictions = [analyzer.polarity_scores(comment) for comment in comments]
+                else:
+                    pipeSVC = self.get_pipeline(column)
+                    if pipeSVC is None:
+                        print(f"Column {column} not found in dataset")
+                        predictions = ["Column not found in dataset"] * len(comments)
+                    else:
+                        predictions = pipeSVC.predict(comments)
+            except Exception as e:
+                predictions = [e] * len(comments)
+
+            for i, prediction in zip(indexes, predictions):
+                results[i] = prediction
+        return results
@@ -0,0 +1,254 @@
+import os
+import time
+import hashlib
+import threading
+from django.conf import settings
+
+DEFAULT_MODEL = "gemini-2.5-flash"
+
+
+class LLMError(Exception):
+    pass
+
+
+class CircuitOpenError(LLMError):
+    pass
+
+
+# HTTP statuses worth retrying: request timeout, rate limited, and server errors
+TRANSIENT_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+
+def is_transient(error):
+    """True for timeouts, rate limiting and server errors, which may succeed when retried
+
+    Backend errors carry their HTTP status as code (google.api_core) or status_code.
+    """
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    code = getattr(error, 'code', None)
+    if not isinstance(code, int):
+        code = getattr(error, 'status_code', None)
+    return isinstance(code, int) and code in TRANSIENT_STATUS_CODES
+
+
+class GeminiBackend:
+    """Google Gemini, configured once per process"""
+    name = 'gemini'
+
+    def __init__(self, model_name):
+        import google.generativeai as genai
+
+        api_key = os.environ.get("GEMINI_API_KEY") or getattr(settings, 'GEMINI_API_KEY', None)
+        if not api_key:
+            raise ValueError("GEMINI_API_KEY not found in environment variables or Django settings")
+
+        genai.configure(api_key=api_key)
+        self.model_name = model_name
+        self.model = genai.GenerativeModel(model_name)
+
+    def generate(self, prompt, timeout):
+        response = self.model.generate_content(prompt, request_options={'timeout': timeout})
+        return response.text
+
+    def stream(self, prompt, timeout):
+        response = self.model.generate_content(prompt, stream=True, request_options={'timeout': timeout})
+        for chunk in response:
+            try:
+                text = chunk.text
+            except ValueError:
+                # Chunks without text parts (e.g. a final safety/finish chunk)
+                continue
+            if text:
+                yield text
+
+
+class StubBackend:
+    """Deterministic offline backend for CI and load tests; never touches the network"""
+    name = 'stub'
+
+    def __init__(self, model_name='stub', latency=0.0):
+        self.model_name = model_name
+        self.latency = latency
+
+    def generate(self, prompt, timeout):
+        if self.latency:
+            time.sleep(min(self.latency, timeout))
+        digest = hashlib.sha256(prompt.encode('utf-8')).hexdigest()[:12]
+        return (
+            "*PERFORMANCE SUMMARY:*\n"
+            "- Overall performance rating: Good\n"
+            "*KEY STRENGTHS:*\n"
+            "- Reliable and supportive team member\n"
+            "*AREAS FOR IMPROVEMENT:*\n"
+            "- Communicate progress earlier\n"
+            f"\n(Stub analysis {digest} of a {len(prompt)} character prompt)"
+        )
+
+    def stream(self, prompt, timeout):
+        text = self.generate(prompt, 0)
+        lines = text.splitlines(keepends=True)
+        for line in lines:
+            if self.latency:
+                time.sleep(min(self.latency / len(lines), timeout))
+            yield line
+
+
+class CircuitBreaker:
+    """Fails fast for reset_timeout seconds after failure_threshold consecutive failures"""
+
+    def __init__(self, failure_threshold=5, reset_timeout=60):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.lock = threading.Lock()
+
+    def allow(self):
+        with self.lock:
+            if self.opened_at is None:
+                return True
+            # Half-open: let one trial call through once the timeout has passed
+            if time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.opened_at = time.monotonic()
+                return True
+            return False
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+
+class RateLimiter:
+    """Thread-safe client-side limiter spacing calls at most rate_per_minute apart"""
+
+    def __init__(self, rate_per_minute):
+        self.interval = 60.0 / rate_per_minute if rate_per_minute else 0
+        self.next_slot = time.monotonic()
+        self.lock = threading.Lock()
+
+    def wait(self):
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot)
+            self.next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class LLMClient:
+    """Backend wrapper adding per-call deadlines, rate limiting, retries and a circuit breaker
+
+    This is the only place LLM calls are retried: transient errors (timeouts, 429, 5xx)
+    are retried with backoff, anything else fails at once. Every call, retries included,
+    waits for the rate limiter.
+    """
+
+    def __init__(self, backend, timeout=60, max_retries=2, backoff=1.0, breaker=None, rate_limiter=None):
+        self.backend = backend
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.breaker = breaker or CircuitBreaker()
+        self.rate_limiter = rate_limiter or RateLimiter(0)
+
+    @property
+    def model_name(self):
+        return self.backend.model_name
+
+    def _acquire(self):
+        if not self.breaker.allow():
+            raise CircuitOpenError(f"{self.backend.name} circuit is open after repeated failures, try again later")
+        self.rate_limiter.wait()
+
+    def generate(self, prompt, timeout=None):
+        timeout = timeout or self.timeout
+
+        for attempt in range(self.max_retries + 1):
+            self._acquire()
+            try:
+                text = self.backend.generate(prompt, timeout)
+            except Exception as e:
+                if not is_transient(e):
+                    raise LLMError(f"{self.backend.name} call failed: {e}") from e
+                # Only outages count towards opening the circuit
+                self.breaker.record_failure()
+                if attempt == self.max_retries:
+                    raise LLMError(f"{self.backend.name} call failed after {attempt + 1} attempts: {e}") from e
+                time.sleep(self.backoff * 2 ** attempt)
+                continue
+
+            self.breaker.record_success()
+            return text
+
+    def stream(self, prompt, timeout=None):
+        """Yield text chunks as the backend produces them
+
+        Streams are not retried, since part of the output may already have been delivered.
+        """
+        self._acquire()
+        try:
+            for chunk in self.backend.stream(prompt, timeout or self.timeout):
+                yield chunk
+        except Exception as e:
+            if is_transient(e):
+                self.breaker.record_failure()
+            raise LLMError(f"{self.backend.name} stream failed: {e}") from e
+        self.breaker.record_success()
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def configured_model_name():
+    if getattr(settings, 'LLM_BACKEND', 'gemini') == 'stub':
+        return 'stub'
+    return getattr(settings, 'LLM_MODEL', DEFAULT_MODEL)
+
+
+def build_backend():
+    backend = getattr(settings, 'LLM_BACKEND', 'gemini')
+    if backend == 'stub':
+        return StubBackend(latency=getattr(settings, 'LLM_STUB_LATENCY', 0.0))
+    if backend == 'gemini':
+        return GeminiBackend(configured_model_name())
+    raise ValueError(f"Unknown LLM_BACKEND {backend!r}, expected 'gemini' or 'stub'")
+
+
+def get_llm_client():
+    """Process-wide LLM client, built from settings on first use"""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = LLMClient(
+                    build_backend(),
+                    timeout=getattr(settings, 'LLM_TIMEOUT', 60),
+                    max_retries=getattr(settings, 'LLM_MAX_RETRIES', 2),
+                    breaker=CircuitBreaker(
+                        failure_threshold=getattr(settings, 'LLM_CIRCUIT_FAILURES', 5),
+                        reset_timeout=getattr(settings, 'LLM_CIRCUIT_RESET', 60),
+                    ),
+                    rate_limiter=RateLimiter(getattr(settings, 'SUMMARY_RATE_PER_MINUTE', 30)),
+                )
+    return _client
+
+
+def set_llm_rate_limit(rate_per_minute):
+    """Replace the shared client's rate limit, e.g. from a command line option (0 disables it)"""
+    get_llm_client().rate_limiter = RateLimiter(rate_per_minute)
+
+
+def reset_llm_client():
+    """Drop the shared client so the next call rebuilds it from settings"""
+    global _client
+    with _client_lock:
+        _client = None
@@ -6,34 +6,62 @@ from sklearn.pipeline import Pipeline
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.svm import LinearSVC
 from .genprocess import Brain
+from . import registry
+
+def question_dataset_path():
+    return os.path.join(settings.BASE_DIR, 'evaluation', 'data', 'prodvi-random-questionset.csv')
+
+def train_question_classifier():
+    """Fit the question -> category pipeline from the labelled question set"""
+    df = pd.read_csv(question_dataset_path())
+    df['Label'] = df['Label'].str.replace('(', '').str.replace(')', '').str.strip()
+
+    x = df['Question']
+    y = df['Label']
+
+    X_train, X_test, y_train, y_test = train_test_split(
+        x, y, test_size=0.3, random_state=31929
+    )
+
+    pipeSVC = Pipeline([('tfidf', TfidfVectorizer()), ('clf', LinearSVC(dual=False))])
+    pipeSVC.fit(X_train, y_train)
+    return pipeSVC
 
 class QuestionClassifier:
     def __init__(self):
-        self.base_path = os.path.join(settings.BASE_DIR, 'evaluation', 'data')
-        self.csv_file = os.path.join(self.base_path, 'prodvi-random-questionset.csv')
         self.threshold = 0.9
-        
-        self.df = pd.read_csv(self.csv_file)
-        self.df['Label'] = self.df['Label'].str.replace('(', '').str.replace(')', '').str.strip()
-        
-        self.x = self.df['Question']
-        self.y = self.df['Label']
-        
-        self.X_train, self.X_test, self.y_train, self.y_test = train_test_split(
-            self.x, self.y, test_size=0.3, random_state=31929
-        )
-        
-        self.pipeSVC = Pipeline([('tfidf', TfidfVectorizer()), ('clf', LinearSVC(dual=False))])
-        self.pipeSVC.fit(self.X_train, self.y_train)
+
+        # Serve the pre-trained pipeline when train_models has been run, fit on the fly otherwise
+        self.pipeSVC = registry.load_model(
+            registry.QUESTION_CLASSIFIER,
+            dataset_path=question_dataset_path(),
+            hash_field=registry.QUESTION_DATASET_HASH
+        ) or train_question_classifier()
 
     def classify(self, input_question):
         decision_scores = self.pipeSVC.decision_function([input_question])
         decision_scores = abs(decision_scores)
         max_score = max(decision_scores[0])
-        
+
         if max_score < self.threshold:
             return "Out of Scope", 0.0
         else:
             predicted_label = self.pipeSVC.predict([input_question])
             confidence = max_score
             return predicted_label[0].strip(), confidence
+
+    def classify_batch(self, questions):
+        """Classify many questions with one decision_function/predict over the whole matrix"""
+        if not questions:
+            return []
+
+        max_scores = abs(self.pipeSVC.decision_function(questions)).max(axis=1)
+        predicted_labels = self.pipeSVC.predict(questions)
+
+        results = []
+        for max_score, label in zip(max_scores, predicted_labels):
+            if max_score < self.threshold:
+                results.append(("Out of Scope", 0.0))
+            else:
+                results.append((label.strip(), max_score))
+        return results
@@ -0,0 +1,132 @@
+import os
+import json
+import hashlib
+import threading
+import joblib
+import sklearn
+from django.conf import settings
+from django.utils import timezone
+
+QUESTION_CLASSIFIER = 'question_classifier'
+MANIFEST_FILE = 'manifest.json'
+LATEST_FILE = 'LATEST'
+# Manifest fields recording the SHA-256 of the CSV each kind of model was trained on
+QUESTION_DATASET_HASH = 'question_dataset_sha256'
+ANSWER_DATASET_HASH = 'answer_dataset_sha256'
+
+_loaded_models = {}
+_manifests = {}
+_dataset_hashes = {}
+_lock = threading.Lock()
+
+
+def get_artifact_root():
+    """Directory that holds one sub-directory per trained model version"""
+    return getattr(
+        settings,
+        'ML_ARTIFACT_DIR',
+        os.path.join(settings.BASE_DIR, 'evaluation', 'ml_models', 'artifacts')
+    )
+
+
+def category_model_name(column):
+    return f"category_{column.strip()}"
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(65536), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def dataset_sha256(path):
+    """file_sha256 of a dataset, only re-hashed when its size or mtime changes"""
+    stat = os.stat(path)
+    key = (path, stat.st_mtime, stat.st_size)
+    if key not in _dataset_hashes:
+        _dataset_hashes[key] = file_sha256(path)
+    return _dataset_hashes[key]
+
+
+def active_version():
+    """Version pinned in settings, otherwise the last version written by train_models"""
+    pinned = getattr(settings, 'ML_MODEL_VERSION', None)
+    if pinned:
+        return pinned
+
+    latest_path = os.path.join(get_artifact_root(), LATEST_FILE)
+    try:
+        with open(latest_path, 'r', encoding='utf-8') as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def save_models(models, version=None, metadata=None):
+    """Write fitted pipelines as a new versioned artifact set and mark it as latest"""
+    version = version or timezone.now().strftime('%Y%m%d%H%M%S')
+    version_dir = os.path.join(get_artifact_root(), version)
+    os.makedirs(version_dir, exist_ok=True)
+
+    for name, pipeline in models.items():
+        joblib.dump(pipeline, os.path.join(version_dir, f"{name}.joblib"))
+
+    manifest = {
+        'version': version,
+        'trained_at': timezone.now().isoformat(),
+        'sklearn_version': sklearn.__version__,
+        'models': sorted(models.keys()),
+    }
+    manifest.update(metadata or {})
+    with open(os.path.join(version_dir, MANIFEST_FILE), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+
+    # Written last so readers never see a half-written version as latest
+    with open(os.path.join(get_artifact_root(), LATEST_FILE), 'w', encoding='utf-8') as f:
+        f.write(version)
+
+    clear_loaded_models()
+    return version
+
+
+def load_manifest(version):
+    """The manifest of a trained version, {} when it has none"""
+    if version not in _manifests:
+        try:
+            with open(os.path.join(get_artifact_root(), version, MANIFEST_FILE), 'r', encoding='utf-8') as f:
+                _manifests[version] = json.load(f)
+        except FileNotFoundError:
+            return {}
+    return _manifests[version]
+
+
+def load_model(name, dataset_path=None, hash_field=ANSWER_DATASET_HASH):
+    """Return the fitted pipeline for name from the active version, or None if not trained
+
+    With dataset_path, None is also returned when the manifest's hash_field does not
+    match that file, so callers refit instead of serving a model of an older dataset.
+    Misses are not cached; a model trained later is picked up on the next call.
+    """
+    version = active_version()
+    if not version:
+        return None
+
+    key = (version, name)
+    with _lock:
+        if dataset_path is not None and load_manifest(version).get(hash_field) != dataset_sha256(dataset_path):
+            return None
+
+        if key not in _loaded_models:
+            path = os.path.join(get_artifact_root(), version, f"{name}.joblib")
+            if not os.path.exists(path):
+                return None
+            _loaded_models[key] = joblib.load(path)
+        return _loaded_models[key]
+
+
+def clear_loaded_models():
+    with _lock:
+        _loaded_models.clear()
+        _manifests.clear()
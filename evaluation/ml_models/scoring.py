@@ -0,0 +1,136 @@
+import numpy as np
+import pandas as pd
+
+RATING_LABELS = ['Excellent', 'Good', 'Average', 'Needs Improvement']
+
+# Score out of 5 for every label the answer models predict, keyed by dataset column
+# (the category analyze_submissions stores). Five-level scales run
+# 5..1; four-level scales use Excellent=5 .. Needs Improvement=2 like the rating buckets.
+# Areas_to_Improve names a topic rather than a level, so it is not scored.
+PREDICTION_SCORES = {
+    'Ease_of_Working_Together': {
+        'very easy': 5, 'easy': 4, 'neutral': 3, 'difficult': 2, 'very difficult': 1,
+    },
+    'Cooperation': {
+        'highly cooperative': 5, 'always': 5, 'cooperative': 4, 'sometimes': 3, 'neutral': 3,
+        'rarely': 2, 'difficult': 2, 'not cooperative': 1, 'very uncooperative': 1,
+    },
+    'Work_Ethics': {
+        'excellent': 5, 'good': 4, 'average': 3, 'poor': 2, 'very poor': 1,
+    },
+    'Helps_Others': {
+        'always': 5, 'often': 4, 'sometimes': 3, 'rarely': 2, 'never': 1,
+    },
+    'Punctuality': {
+        'always on time': 5, 'usually on time': 4, 'sometimes late': 3, 'frequently late': 2,
+    },
+    'Work_Efficiency': {
+        'highly efficient': 5, 'moderately efficient': 4, 'average efficiency': 3, 'needs improvement': 2,
+    },
+    'Problem_Solving': {
+        'exceptional problem solver': 5, 'good problem solver': 4,
+        'average problem solver': 3, 'struggles with problem solving': 2,
+    },
+    'Adaptability': {
+        'highly adaptable': 5, 'moderately adaptable': 4, 'somewhat adaptable': 3, 'resistant to change': 2,
+    },
+    'Communication': {
+        'excellent communicator': 5, 'good communicator': 4,
+        'average communicator': 3, 'needs improvement in communication': 2,
+    },
+    'Innovation': {
+        'highly innovative': 5, 'moderately innovative': 4, 'average innovator': 3, 'limited innovation': 2,
+    },
+    'Leadership': {
+        'strong leader': 5, 'good leader': 4, 'moderate leadership skills': 3, 'struggles with leadership': 2,
+    },
+    'Self_Motivation': {
+        'highly self-motivated': 5, 'moderately self-motivated': 4,
+        'somewhat self-motivated': 3, 'low self-motivation': 2,
+    },
+    'Emotional_Intelligence': {
+        'highly emotionally intelligent': 5, 'moderate emotional intelligence': 4,
+        'somewhat emotionally intelligent': 3, 'low emotional intelligence': 2,
+    },
+}
+
+SCORE_TABLE = pd.DataFrame(
+    [
+        (category, label, float(score))
+        for category, scores in PREDICTION_SCORES.items()
+        for label, score in scores.items()
+    ],
+    columns=['category', 'label', 'score'],
+)
+
+
+def score_predictions(rows):
+    """Attach a numeric score and rating bucket to (reviewee_id, ml_analysis) rows
+
+    Returns one row per scored answer with reviewee_id, category, score and rating.
+    Errors, out-of-scope questions and unknown labels are dropped.
+    """
+    frame = pd.DataFrame(
+        [
+            (reviewee_id, result.get('category'), result.get('prediction'))
+            for reviewee_id, ml_analysis in rows
+            for result in (ml_analysis or {}).values()
+            if isinstance(result, dict) and 'prediction' in result
+        ],
+        columns=['reviewee_id', 'category', 'label'],
+    )
+    frame['label'] = frame['label'].astype(str).str.strip().str.lower()
+    frame['category'] = frame['category'].astype(str).str.strip()
+    frame = frame.merge(SCORE_TABLE, on=['category', 'label'], how='inner')
+
+    # Nearest bucket: 5 Excellent, 4 Good, 3 Average, 2 or less Needs Improvement
+    buckets = np.clip(np.rint(5 - frame['score'].to_numpy()), 0, len(RATING_LABELS) - 1).astype(int)
+    frame['rating'] = np.array(RATING_LABELS)[buckets]
+    return frame
+
+
+def score_answer(category, label):
+    """(category, score, rating) of one prediction, scored like score_predictions
+
+    score is None and rating empty when the label is not scored.
+    """
+    category = str(category).strip()
+    score = PREDICTION_SCORES.get(category, {}).get(str(label).strip().lower())
+    if score is None:
+        return category, None, ''
+    bucket = min(max(round(5 - score), 0), len(RATING_LABELS) - 1)
+    return category, float(score), RATING_LABELS[bucket]
+
+
+def aggregate_scores(rows):
+    """Per-reviewee score rollups for (reviewee_id, ml_analysis) rows of one form
+
+    Returns {reviewee_id: {'overall_score', 'answer_count', 'rating_counts', 'category_scores',
+    'category_answer_counts'}}, computed with grouped pandas operations rather than a per-review loop.
+    """
+    frame = score_predictions(rows)
+    if frame.empty:
+        return {}
+
+    overall = frame.groupby('reviewee_id')['score'].agg(['mean', 'size'])
+    ratings = (
+        frame.groupby(['reviewee_id', 'rating']).size()
+        .unstack(fill_value=0)
+        .reindex(columns=RATING_LABELS, fill_value=0)
+    )
+    categories = frame.groupby(['reviewee_id', 'category'])['score'].agg(['mean', 'size'])
+
+    return {
+        int(reviewee_id): {
+            'overall_score': round(float(overall.at[reviewee_id, 'mean']), 2),
+            'answer_count': int(overall.at[reviewee_id, 'size']),
+            'rating_counts': {label: int(count) for label, count in ratings.loc[reviewee_id].items()},
+            'category_scores': {
+                category: round(float(score), 2) for category, score in categories.loc[reviewee_id, 'mean'].items()
+            },
+            'category_answer_counts': {
+                category: int(count) for category, count in categories.loc[reviewee_id, 'size'].items()
+            },
+        }
+        for reviewee_id in overall.index
+    }
@@ -1,5 +1,7 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import AbstractUser
+from django.utils import timezone
+from django.utils.safestring import mark_safe
 
 class CustomUser(AbstractUser):
     ROLE_CHOICES = [
@@ -10,6 +12,9 @@ class CustomUser(AbstractUser):
     department = models.CharField(max_length=100, blank=True)
     employee_id = models.CharField(max_length=20, blank=True, null=True)
 
+    class Meta(AbstractUser.Meta):
+        indexes = [models.Index(fields=['role'], name='user_role_idx')]
+
 class EvaluationForm(models.Model):
     title = models.CharField(max_length=200)
     description = models.TextField(blank=True)
@@ -19,29 +24,134 @@ class EvaluationForm(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     is_active = models.BooleanField(default=True)
 
+    class Meta:
+        # Admin dashboard: a creator's forms, newest first
+        indexes = [models.Index(fields=['created_by', '-created_at'], name='form_owner_created_idx')]
+
     def __str__(self):
         return self.title
 
 class PeerReview(models.Model):
+    ML_STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
     form = models.ForeignKey(EvaluationForm, on_delete=models.CASCADE)
     reviewer = models.ForeignKey('evaluation.CustomUser', on_delete=models.CASCADE, related_name='reviews_given')
     reviewee = models.ForeignKey('evaluation.CustomUser', on_delete=models.CASCADE, related_name='reviews_received')
     responses = models.JSONField()  # Question -> Answer mapping
     ml_analysis = models.JSONField(blank=True, null=True)  # Store ML results
+    ml_status = models.CharField(max_length=10, choices=ML_STATUS_CHOICES, default='pending')
     submitted_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         unique_together = ['form', 'reviewer', 'reviewee']
+        # unique_together already serves (form, reviewer) lookups and the reviewer FK index (reviewer)
+        indexes = [models.Index(fields=['form', 'reviewee'], name='peerreview_form_reviewee_idx')]
 
     def __str__(self):
         return f"{self.reviewer.username} reviews {self.reviewee.username} - {self.form.title}"
 
+class ReviewProgress(models.Model):
+    """Expected and completed peer reviews of one assigned employee on a form
+
+    Kept current by the signal handlers in evaluation.signals, so readiness checks
+    and dashboard totals are lookups instead of counts over PeerReview.
+    """
+    form = models.ForeignKey(EvaluationForm, on_delete=models.CASCADE, related_name='review_progress')
+    reviewee = models.ForeignKey('evaluation.CustomUser', on_delete=models.CASCADE, related_name='review_progress')
+    expected = models.PositiveIntegerField(default=0)  # Other employees assigned to the form
+    completed = models.PositiveIntegerField(default=0)  # Reviews received from them
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ['form', 'reviewee']
+
+    def __str__(self):
+        return f"{self.reviewee.username}: {self.completed}/{self.expected} reviews - {self.form.title}"
+
+    @property
+    def is_complete(self):
+        return self.expected > 0 and self.completed >= self.expected
+
+    @classmethod
+    def rebuild(cls, form):
+        """Recompute every row of form from its current assignments and reviews
+
+        The rows are locked before anything is counted, so a review_created increment
+        either lands before the count (and is included) or waits for the rebuild.
+        """
+        with transaction.atomic():
+            rows = {row.reviewee_id: row for row in cls.objects.select_for_update().filter(form=form)}
+
+            assigned_ids = set(form.assigned_employees.values_list('id', flat=True))
+            completed = dict(
+                PeerReview.objects
+                .filter(form=form, reviewer_id__in=assigned_ids, reviewee_id__in=assigned_ids)
+                .exclude(reviewer_id=models.F('reviewee_id'))
+                .values('reviewee_id')
+                .annotate(completed=models.Count('id'))
+                .values_list('reviewee_id', 'completed')
+            )
+            expected = max(len(assigned_ids) - 1, 0)
+
+            cls.objects.filter(form=form).exclude(reviewee_id__in=assigned_ids).delete()
+            rows = {reviewee_id: row for reviewee_id, row in rows.items() if reviewee_id in assigned_ids}
+            for reviewee_id in assigned_ids - rows.keys():
+                rows[reviewee_id] = cls(form=form, reviewee_id=reviewee_id)
+            for reviewee_id, row in rows.items():
+                row.expected = expected
+                row.completed = completed.get(reviewee_id, 0)
+            cls.objects.bulk_create([row for row in rows.values() if row.pk is None])
+            cls.objects.bulk_update([row for row in rows.values() if row.pk is not None], ['expected', 'completed'])
+
+class MLAnalysisJob(models.Model):
+    """Queued ML analysis of one PeerReview, processed by the run_ml_worker command"""
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+    review = models.OneToOneField(PeerReview, on_delete=models.CASCADE, related_name='ml_job')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    run_after = models.DateTimeField(default=timezone.now)  # Pushed back after a failed attempt
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['status', 'run_after'])]
+
+    def __str__(self):
+        return f"ML job for review {self.review_id} ({self.status})"
+
 class EmployeeSummary(models.Model):
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Generating'),
+        ('ready', 'Ready'),
+        ('failed', 'Failed'),
+    ]
     employee = models.ForeignKey('evaluation.CustomUser', on_delete=models.CASCADE)
     form = models.ForeignKey(EvaluationForm, on_delete=models.CASCADE)
     summary_file_path = models.CharField(max_length=500, blank=True)
     gemini_analysis = models.TextField(blank=True)  # Store Gemini API response
     generated_at = models.DateTimeField(auto_now_add=True)
+    # New rows are queued for the run_summary_worker command
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    run_after = models.DateTimeField(default=timezone.now)  # Pushed back after a failed attempt
+    updated_at = models.DateTimeField(auto_now=True)
+    # Hash of the review input and prompt/model version the analysis was generated from
+    input_hash = models.CharField(max_length=64, blank=True)
+    prompt_version = models.CharField(max_length=50, blank=True)
+    # gemini_analysis rendered to sanitised HTML, and the render_version it was rendered with
+    analysis_html = models.TextField(blank=True)
+    analysis_html_version = models.CharField(max_length=16, blank=True)
     
     class Meta:
         unique_together = ['employee', 'form']
@@ -49,6 +159,118 @@ class EmployeeSummary(models.Model):
     def __str__(self):
         return f"Summary: {self.employee.username} - {self.form.title}"
 
+    @property
+    def is_generating(self):
+        return self.status in ('pending', 'running')
+
+    def rendered_analysis(self):
+        """The analysis as safe HTML, re-rendering the stored copy if it predates the current settings"""
+        from .rendering import render_analysis, render_version
+
+        version = render_version()
+        if self.analysis_html_version != version:
+            self.analysis_html = render_analysis(self.gemini_analysis)
+            self.analysis_html_version = version
+            # Only while the same analysis is stored, so a regeneration finished meanwhile is not overwritten
+            EmployeeSummary.objects.filter(id=self.id, generated_at=self.generated_at).update(
+                analysis_html=self.analysis_html,
+                analysis_html_version=version
+            )
+        return mark_safe(self.analysis_html)
+
+class ScoreRollup(models.Model):
+    """Aggregated ML scores of one employee on a form, refreshed as reviews are analysed"""
+    form = models.ForeignKey(EvaluationForm, on_delete=models.CASCADE, related_name='score_rollups')
+    employee = models.ForeignKey('evaluation.CustomUser', on_delete=models.CASCADE, related_name='score_rollups')
+    review_count = models.PositiveIntegerField(default=0)  # Analysed reviews included
+    answer_count = models.PositiveIntegerField(default=0)  # Answers with a scorable prediction
+    overall_score = models.FloatField(default=0)  # Mean score out of 5
+    rating_counts = models.JSONField(default=dict)  # Rating bucket -> answers
+    category_scores = models.JSONField(default=dict)  # Category -> mean score out of 5
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ['form', 'employee']
+
+    def __str__(self):
+        return f"Scores: {self.employee.username} - {self.form.title}"
+
+class ScoreTrendPoint(models.Model):
+    """One employee's score on one form, overall or for one category
+
+    Written alongside ScoreRollup, so an employee's history across forms is one
+    indexed query instead of a rescan of every past review.
+    """
+    OVERALL = ''
+    employee = models.ForeignKey('evaluation.CustomUser', on_delete=models.CASCADE, related_name='score_trend')
+    form = models.ForeignKey(EvaluationForm, on_delete=models.CASCADE, related_name='score_trend')
+    category = models.CharField(max_length=50, blank=True)  # OVERALL for the overall score
+    score = models.FloatField()  # Mean score out of 5
+    answer_count = models.PositiveIntegerField(default=0)
+    form_date = models.DateTimeField()  # The form's created_at, so ordering needs no join
+
+    class Meta:
+        unique_together = ['employee', 'form', 'category']
+        indexes = [models.Index(fields=['employee', 'category', 'form_date'], name='trend_employee_category_idx')]
+
+    def __str__(self):
+        return f"{self.employee.username} {self.category or 'overall'}: {self.score} - {self.form.title}"
+
+    @classmethod
+    def trend(cls, employee, category=OVERALL, until=None, created_by=None):
+        """[(form title, score)] for employee across forms, oldest first, in one query
+
+        created_by limits the history to forms owned by that admin.
+        """
+        points = cls.objects.filter(employee=employee, category=category)
+        if until is not None:
+            points = points.filter(form_date__lte=until)
+        if created_by is not None:
+            points = points.filter(form__created_by=created_by)
+        return list(points.order_by('form_date', 'form_id').values_list('form__title', 'score'))
+
+
+class ReviewAnswer(models.Model):
+    """One answer of an analysed review with its ML outputs, one row per question
+
+    Written alongside PeerReview.ml_analysis, so per-question and per-category reports
+    are GROUP BY queries instead of parsing every review's JSON.
+    """
+    review = models.ForeignKey(PeerReview, on_delete=models.CASCADE, related_name='answers')
+    # Copied from the review, so reports filter and group without a join
+    form = models.ForeignKey(EvaluationForm, on_delete=models.CASCADE, related_name='review_answers')
+    reviewee = models.ForeignKey('evaluation.CustomUser', on_delete=models.CASCADE, related_name='review_answers')
+    question_index = models.PositiveSmallIntegerField()  # Position in the form's questions
+    category = models.CharField(max_length=50, blank=True)
+    prediction = models.CharField(max_length=100, blank=True)  # Empty when the analysis failed
+    confidence = models.FloatField(null=True, blank=True)  # Category confidence in percent
+    score = models.FloatField(null=True, blank=True)  # Out of 5; null when the prediction is not scored
+    rating = models.CharField(max_length=20, blank=True)  # Rating bucket of the score
+    sentiment = models.FloatField(null=True, blank=True)  # VADER compound score of Out of Scope answers, -1..1
+
+    class Meta:
+        unique_together = ['review', 'question_index']
+        indexes = [
+            models.Index(fields=['form', 'question_index'], name='answer_form_question_idx'),
+            models.Index(fields=['form', 'category'], name='answer_form_category_idx'),
+            models.Index(fields=['reviewee', 'category'], name='answer_reviewee_category_idx'),
+        ]
+
+    def __str__(self):
+        return f"Answer {self.question_index} of review {self.review_id}: {self.prediction}"
+
+    @classmethod
+    def category_report(cls, form):
+        """[{'category', 'answers', 'average_score'}] for form, aggregated in SQL"""
+        return list(
+            cls.objects
+            .filter(form=form)
+            .exclude(category='')
+            .values('category')
+            .annotate(answers=models.Count('id'), average_score=models.Avg('score'))
+            .order_by('category')
+        )
+
 # Keep for backward compatibility if needed
 class EvaluationResponse(models.Model):
     form = models.ForeignKey(EvaluationForm, on_delete=models.CASCADE)
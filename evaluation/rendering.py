@@ -0,0 +1,25 @@
+"""Sanitised HTML for the Markdown summaries, rendered once and stored on EmployeeSummary"""
+import hashlib
+import json
+import bleach
+import markdown
+from django.conf import settings
+from markdownify.templatetags.markdownify import markdownify
+
+
+def render_version():
+    """Fingerprint of everything that affects the rendering: the MARKDOWNIFY settings and library versions
+
+    Stored HTML with a different fingerprint is stale and is rendered again.
+    """
+    options = {
+        'markdownify': getattr(settings, 'MARKDOWNIFY', {}).get('default', {}),
+        'markdown': markdown.__version__,
+        'bleach': bleach.__version__,
+    }
+    return hashlib.sha256(json.dumps(options, sort_keys=True, default=str).encode()).hexdigest()[:16]
+
+
+def render_analysis(text):
+    """Markdown to sanitised HTML, exactly as the markdownify template filter renders it"""
+    return str(markdownify(text))
@@ -0,0 +1,123 @@
+"""Keep ReviewProgress and the dashboard cache in step with reviews, forms and assignments
+
+Progress counters are updated inside the writer's transaction; cached dashboards
+are dropped and score rollups recomputed when it commits.
+"""
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from . import dashboard_cache
+from .models import CustomUser, EvaluationForm, PeerReview, ReviewProgress
+
+
+def counts_towards_progress(review):
+    """Only reviews between two employees assigned to the form count"""
+    return review.reviewer_id != review.reviewee_id and EvaluationForm.assigned_employees.through.objects.filter(
+        evaluationform_id=review.form_id,
+        customuser_id=review.reviewer_id
+    ).exists()
+
+
+@receiver(post_save, sender=PeerReview)
+def review_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw and counts_towards_progress(instance):
+        ReviewProgress.objects.filter(form_id=instance.form_id, reviewee_id=instance.reviewee_id).update(
+            completed=F('completed') + 1
+        )
+
+
+@receiver(post_delete, sender=PeerReview)
+def review_deleted(sender, instance, **kwargs):
+    if counts_towards_progress(instance):
+        ReviewProgress.objects.filter(
+            form_id=instance.form_id,
+            reviewee_id=instance.reviewee_id,
+            completed__gt=0
+        ).update(completed=F('completed') - 1)
+
+
+@receiver(post_delete, sender=PeerReview)
+def analysed_review_deleted(sender, instance, **kwargs):
+    # Reviews still waiting for analysis are not part of any rollup yet
+    if instance.ml_status == 'done':
+        from .tasks import refresh_score_rollups
+        transaction.on_commit(lambda: refresh_score_rollups(instance.form_id, [instance.reviewee_id]))
+
+
+@receiver(m2m_changed, sender=EvaluationForm.assigned_employees.through)
+def assignments_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        ReviewProgress.rebuild(instance)
+    elif action == 'post_clear':
+        # An employee was removed from all forms; pk_set is not provided for clears
+        for form in EvaluationForm.objects.filter(review_progress__reviewee=instance):
+            ReviewProgress.rebuild(form)
+    else:
+        for form in EvaluationForm.objects.filter(id__in=pk_set):
+            ReviewProgress.rebuild(form)
+
+
+def invalidate_review_dashboards(form_id, reviewer_ids=(), reviewee_ids=()):
+    """Drop the dashboards that show reviews on form_id: its owner's, the reviewees' review lists and the reviewers'"""
+    admin_id = EvaluationForm.objects.filter(id=form_id).values_list('created_by_id', flat=True).first()
+    dashboard_cache.invalidate(dashboard_cache.ADMIN_DASHBOARD, [admin_id])
+    dashboard_cache.invalidate(
+        dashboard_cache.FORM_REVIEWS,
+        [dashboard_cache.reviews_key(form_id, reviewee_id) for reviewee_id in reviewee_ids]
+    )
+    dashboard_cache.invalidate(dashboard_cache.EMPLOYEE_DASHBOARD, reviewer_ids)
+
+
+def invalidate_form_dashboards(form, employee_ids=()):
+    """Drop the dashboards that show form: its owner's and every assignee's
+
+    Review lists only hold reviews, which have their own signals.
+    """
+    assigned_ids = set(form.assigned_employees.values_list('id', flat=True)) | set(employee_ids)
+    dashboard_cache.invalidate(dashboard_cache.ADMIN_DASHBOARD, [form.created_by_id])
+    dashboard_cache.invalidate(dashboard_cache.EMPLOYEE_DASHBOARD, assigned_ids)
+
+
+@receiver(post_save, sender=PeerReview)
+@receiver(post_delete, sender=PeerReview)
+def review_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        invalidate_review_dashboards(instance.form_id, [instance.reviewer_id], [instance.reviewee_id])
+
+
+@receiver(post_save, sender=EvaluationForm)
+def form_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        invalidate_form_dashboards(instance)
+
+
+@receiver(pre_delete, sender=EvaluationForm)
+def form_deleted(sender, instance, **kwargs):
+    # Before the delete, while its assignments can still be read
+    invalidate_form_dashboards(instance)
+
+
+@receiver(m2m_changed, sender=EvaluationForm.assigned_employees.through)
+def assignment_dashboards_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    # pre_clear is the last point where the employees being unassigned can still be read
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if not reverse:
+        invalidate_form_dashboards(instance, pk_set or ())
+    elif action == 'pre_clear':
+        for form in instance.assigned_forms.all():
+            invalidate_form_dashboards(form)
+    else:
+        for form in EvaluationForm.objects.filter(id__in=pk_set):
+            invalidate_form_dashboards(form, [instance.id])
+
+
+@receiver(post_save, sender=CustomUser)
+@receiver(post_delete, sender=CustomUser)
+def user_changed(sender, instance, update_fields=None, raw=False, **kwargs):
+    # Names and employee counts appear on many dashboards; logins only touch last_login
+    if not raw and update_fields != frozenset(['last_login']):
+        dashboard_cache.invalidate_all()
@@ -0,0 +1,629 @@
+"""DB-backed background jobs, processed by the run_ml_worker and run_summary_worker management commands"""
+import ast
+import gzip
+import json
+import hashlib
+import logging
+import traceback
+from collections import Counter
+from datetime import timedelta
+from django.db.models import F
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from .dashboard_cache import invalidate, reviews_key, FORM_REVIEWS
+from .models import (
+    EvaluationForm, PeerReview, MLAnalysisJob, EmployeeSummary, ReviewProgress, ReviewAnswer, ScoreRollup,
+    ScoreTrendPoint,
+)
+
+logger = logging.getLogger(__name__)
+
+ML_JOB_MAX_ATTEMPTS = 5
+ML_JOB_RETRY_DELAY = 30  # Seconds, doubled after every failed attempt
+SUMMARY_MAX_ATTEMPTS = 3
+SUMMARY_RETRY_DELAY = 60  # Seconds, doubled after every failed attempt
+
+
+def enqueue_ml_analysis(review):
+    """Queue the ML analysis of a freshly saved review"""
+    job, created = MLAnalysisJob.objects.get_or_create(review=review)
+    if not created and job.status in ('done', 'failed'):
+        job.status = 'pending'
+        job.attempts = 0
+        job.run_after = timezone.now()
+        job.save(update_fields=['status', 'attempts', 'run_after', 'updated_at'])
+    PeerReview.objects.filter(id=review.id).update(ml_status='pending')
+    return job
+
+
+def claim_ml_jobs(limit):
+    """Atomically move up to limit due jobs from pending to running and return them"""
+    with transaction.atomic():
+        job_ids = list(
+            MLAnalysisJob.objects
+            .select_for_update(skip_locked=True)
+            .filter(status='pending', run_after__lte=timezone.now())
+            .order_by('run_after')
+            .values_list('id', flat=True)[:limit]
+        )
+        # The status filter keeps two workers on databases without row locks from claiming the same job
+        claimed = []
+        for job_id in job_ids:
+            if MLAnalysisJob.objects.filter(id=job_id, status='pending').update(status='running', updated_at=timezone.now()):
+                claimed.append(job_id)
+
+    return list(
+        MLAnalysisJob.objects
+        .filter(id__in=claimed)
+        .select_related('review__form')
+    )
+
+
+def process_ml_jobs(jobs, max_attempts=ML_JOB_MAX_ATTEMPTS):
+    """Analyse the reviews of the claimed jobs in one batch and store the results"""
+    from .ml_models.analysis import analyze_submissions
+
+    if not jobs:
+        return 0
+
+    submissions = []
+    for job in jobs:
+        review = job.review
+        questions = review.form.questions
+        answers = [review.responses.get(question['text'], '') for question in questions]
+        submissions.append((questions, answers))
+
+    try:
+        results = analyze_submissions(submissions)
+        # An answer the models could not predict fails the whole review's attempt,
+        # so it is retried with backoff and eventually marked failed
+        analysed, failed = [], []
+        for job, ml_analysis in zip(jobs, results):
+            errors = [
+                f"{question}: {result['error']}"
+                for question, result in ml_analysis.items()
+                if isinstance(result, dict) and 'error' in result
+            ]
+            if errors:
+                failed.append((job, '\n'.join(errors)))
+            else:
+                analysed.append((job, ml_analysis))
+
+        with transaction.atomic():
+            for job, ml_analysis in analysed:
+                PeerReview.objects.filter(id=job.review_id).update(
+                    ml_analysis=ml_analysis,
+                    ml_status='done'
+                )
+                job.review.ml_analysis = ml_analysis
+                # Written with update() so a rollback leaves the in-memory jobs as claimed for fail_ml_job
+                MLAnalysisJob.objects.filter(id=job.id).update(
+                    status='done',
+                    attempts=F('attempts') + 1,
+                    last_error='',
+                    updated_at=timezone.now()
+                )
+            store_review_answers([job.review for job, ml_analysis in analysed])
+    except Exception:
+        error = traceback.format_exc()
+        analysed, failed = [], [(job, error) for job in jobs]
+
+    for job, error in failed:
+        fail_ml_job(job, error, max_attempts)
+
+    # Review statuses were changed with update(), which sends no signals
+    invalidate(FORM_REVIEWS, {reviews_key(job.review.form_id, job.review.reviewee_id) for job in jobs})
+
+    # Fresh predictions change the reviewees' score rollups; a failure here leaves the jobs done
+    affected = {}
+    for job, ml_analysis in analysed:
+        affected.setdefault(job.review.form_id, set()).add(job.review.reviewee_id)
+    for form_id, reviewee_ids in affected.items():
+        try:
+            refresh_score_rollups(form_id, reviewee_ids)
+        except Exception:
+            traceback.print_exc()
+
+    return len(analysed)
+
+
+def store_review_answers(reviews):
+    """Replace the ReviewAnswer rows of analysed reviews with rows built from their ml_analysis
+
+    Reviews need their form loaded; questions without a result get no row.
+    """
+    from .ml_models.scoring import score_answer
+
+    answers = []
+    for review in reviews:
+        ml_analysis = review.ml_analysis or {}
+        for index, question in enumerate(review.form.questions):
+            result = ml_analysis.get(question['text'])
+            if not isinstance(result, dict):
+                continue
+            category, score, rating = '', None, ''
+            if 'prediction' in result:
+                category, score, rating = score_answer(result.get('category'), result['prediction'])
+            sentiment = answer_sentiment(result)
+            answers.append(ReviewAnswer(
+                review_id=review.id,
+                form_id=review.form_id,
+                reviewee_id=review.reviewee_id,
+                question_index=index,
+                category=category,
+                # Sentiment answers have polarity scores rather than a label
+                prediction='' if sentiment is not None else str(result.get('prediction', ''))[:100],
+                confidence=result.get('confidence'),
+                score=score,
+                rating=rating,
+                sentiment=sentiment
+            ))
+
+    with transaction.atomic():
+        ReviewAnswer.objects.filter(review__in=[review.id for review in reviews]).delete()
+        ReviewAnswer.objects.bulk_create(answers)
+    return len(answers)
+
+
+def answer_sentiment(result):
+    """VADER compound score of an Out of Scope answer's ml_analysis result, None for other answers
+
+    Analyses stored before the sentiment key existed only have the scores dict as text.
+    """
+    if 'sentiment' in result:
+        return result['sentiment']
+    if result.get('category') != 'Out of Scope':
+        return None
+    try:
+        return float(ast.literal_eval(result.get('prediction', ''))['compound'])
+    except (ValueError, SyntaxError, TypeError, KeyError):
+        return None
+
+
+def refresh_score_rollups(form_id, reviewee_ids=None):
+    """Recompute the ScoreRollup rows of a form from its analysed reviews
+
+    All reviews are scored in one pandas pass; reviewee_ids limits the refresh to some employees.
+    Rollups of employees left without analysed reviews are removed.
+    """
+    from .ml_models.scoring import aggregate_scores
+
+    form_date = EvaluationForm.objects.filter(id=form_id).values_list('created_at', flat=True).first()
+    if form_date is None:
+        # The form was deleted, taking its rollups with it
+        return 0
+
+    reviews = PeerReview.objects.filter(form_id=form_id, ml_status='done')
+    if reviewee_ids is not None:
+        reviews = reviews.filter(reviewee_id__in=reviewee_ids)
+    rows = list(reviews.values_list('reviewee_id', 'ml_analysis'))
+
+    rollups = aggregate_scores(rows)
+    review_counts = Counter(reviewee_id for reviewee_id, ml_analysis in rows)
+    empty = {'overall_score': 0, 'answer_count': 0, 'rating_counts': {}, 'category_scores': {}}
+
+    trend_points = []
+    for reviewee_id, rollup in rollups.items():
+        scores = [(ScoreTrendPoint.OVERALL, rollup['overall_score'], rollup['answer_count'])]
+        scores += [
+            (category, score, rollup['category_answer_counts'][category])
+            for category, score in rollup['category_scores'].items()
+        ]
+        trend_points += [
+            ScoreTrendPoint(
+                employee_id=reviewee_id,
+                form_id=form_id,
+                category=category,
+                score=score,
+                answer_count=answer_count,
+                form_date=form_date
+            )
+            for category, score, answer_count in scores
+        ]
+
+    with transaction.atomic():
+        for reviewee_id, review_count in review_counts.items():
+            ScoreRollup.objects.update_or_create(
+                form_id=form_id,
+                employee_id=reviewee_id,
+                defaults={
+                    'review_count': review_count,
+                    **{field: rollups.get(reviewee_id, empty)[field] for field in empty}
+                }
+            )
+        stale_rollups = ScoreRollup.objects.filter(form_id=form_id).exclude(employee_id__in=review_counts.keys())
+        # Replace this form's points in each reviewee's history
+        old_points = ScoreTrendPoint.objects.filter(form_id=form_id)
+        if reviewee_ids is not None:
+            stale_rollups = stale_rollups.filter(employee_id__in=reviewee_ids)
+            old_points = old_points.filter(employee_id__in=reviewee_ids)
+        stale_rollups.delete()
+        old_points.delete()
+        ScoreTrendPoint.objects.bulk_create(trend_points)
+    return len(review_counts)
+
+
+def fail_ml_job(job, error, max_attempts=ML_JOB_MAX_ATTEMPTS):
+    """Schedule a retry with exponential backoff, or give up after max_attempts"""
+    job.attempts += 1
+    job.last_error = error
+    if job.attempts >= max_attempts:
+        job.status = 'failed'
+        PeerReview.objects.filter(id=job.review_id).update(ml_status='failed')
+    else:
+        job.status = 'pending'
+        job.run_after = timezone.now() + timedelta(seconds=ML_JOB_RETRY_DELAY * 2 ** (job.attempts - 1))
+    job.save(update_fields=['status', 'attempts', 'last_error', 'run_after', 'updated_at'])
+
+
+def release_stale_ml_jobs(timeout=600):
+    """Return jobs left running by a worker that died to the queue"""
+    return MLAnalysisJob.objects.filter(
+        status='running',
+        updated_at__lt=timezone.now() - timedelta(seconds=timeout)
+    ).update(status='pending', updated_at=timezone.now())
+
+
+def run_ml_jobs(batch_size=50, max_attempts=ML_JOB_MAX_ATTEMPTS):
+    """Claim and process one batch, returning the number of reviews analysed"""
+    return process_ml_jobs(claim_ml_jobs(batch_size), max_attempts)
+
+
+def build_summary_data(employee, form):
+    """Collect every peer review answer for employee on form, grouped by question"""
+    
+    # Get all reviews for this employee on this form
+    reviews = list(PeerReview.objects.filter(reviewee=employee, form=form).select_related('reviewer'))
+    
+    if not reviews:
+        return None
+    
+    # Create summary data in format like your examples
+    summary_data = {
+        "name": employee.username,
+        "questions": []
+    }
+    
+    # Organize answers by question
+    for question in form.questions:
+        question_data = {
+            "question": question['text'],
+            "answers": []
+        }
+        
+        # Collect all answers for this question from different reviewers
+        for review in reviews:
+            if question['text'] in review.responses:
+                answer = review.responses[question['text']]
+                reviewer_name = review.reviewer.username
+                question_data['answers'].append(f"{answer} (by {reviewer_name})")
+        
+        summary_data['questions'].append(question_data)
+    
+    return summary_data
+
+
+def summary_input_hash(summary_data):
+    """Hash of the normalized review input and prompt/model version behind a summary"""
+    from .ml_models.api import summary_prompt_version
+
+    normalized = {
+        'name': summary_data['name'],
+        'questions': [
+            {
+                'question': question['question'].strip(),
+                # Review order does not change the summary
+                'answers': sorted(' '.join(answer.split()) for answer in question['answers']),
+            }
+            for question in summary_data['questions']
+        ],
+        'prompt_version': summary_prompt_version(),
+    }
+    payload = json.dumps(normalized, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def archive_summary_data(employee, form, summary_data):
+    """Keep a compressed copy of the prompt input when SUMMARY_ARCHIVE_ENABLED is set
+
+    Prompts are built in memory; the archive is only an audit trail. It goes through
+    Django's storage API and keeps the newest SUMMARY_ARCHIVE_RETENTION copies per
+    employee and form. Returns the archive name, or '' when archiving is off or the
+    storage failed; a storage error is logged and never fails the summary.
+    """
+    if not getattr(settings, 'SUMMARY_ARCHIVE_ENABLED', False):
+        return ''
+
+    from django.core.files.base import ContentFile
+    from django.core.files.storage import default_storage
+
+    # One directory per employee and form, so retention never touches anyone else's archives
+    directory = f"summaries/{form.id}/{employee.id}"
+    try:
+        payload = gzip.compress(json.dumps(summary_data, ensure_ascii=False).encode('utf-8'))
+        stamp = timezone.now().strftime('%Y%m%d%H%M%S%f')
+        name = default_storage.save(f"{directory}/{stamp}.json.gz", ContentFile(payload))
+    except Exception:
+        logger.exception('Could not archive the summary input in %s', directory)
+        return ''
+
+    # Timestamped names sort chronologically; drop everything past the retention limit
+    retention = getattr(settings, 'SUMMARY_ARCHIVE_RETENTION', 5)
+    try:
+        directories, files = default_storage.listdir(directory)
+        archived = sorted(filename for filename in files if filename.endswith('.json.gz'))
+        for filename in archived[:-retention] if retention > 0 else []:
+            default_storage.delete(f"{directory}/{filename}")
+    except Exception:
+        logger.exception('Could not prune the summary archives in %s', directory)
+
+    return name
+
+
+def process_with_gemini_api(summary_data):
+    """Analyse the in-memory summary data with the configured LLM
+
+    Returns (analysis, error): the generated text and None, or None and the error message.
+    Safe to run on worker threads, since failures are returned rather than raised.
+    """
+    try:
+        from .ml_models.api import FileProcessor
+        return FileProcessor().process_data(summary_data), None
+    except Exception as e:
+        return None, f"Error processing with Gemini API: {str(e)}"
+
+
+def summary_is_current(summary, summary_data):
+    """True when the stored analysis was generated from exactly this input"""
+    return (
+        summary.status == 'ready'
+        and bool(summary.gemini_analysis)
+        and summary.input_hash == summary_input_hash(summary_data)
+    )
+
+
+def update_summary_if_status(summary, expected_status, due=False, **fields):
+    """Compare-and-set: apply fields only while the row still has expected_status
+
+    Every summary state change goes through here, so two requests or workers can
+    never both move the same (employee, form) summary into generation. With due set,
+    a summary still backing off (run_after in the future) is left alone as well.
+    """
+    now = timezone.now()
+    fields['updated_at'] = now
+    rows = EmployeeSummary.objects.filter(id=summary.id, status=expected_status)
+    if due:
+        rows = rows.filter(run_after__lte=now)
+    updated = rows.update(**fields)
+    if updated:
+        for name, value in fields.items():
+            setattr(summary, name, value)
+    else:
+        summary.refresh_from_db()
+    return bool(updated)
+
+
+def enqueue_summary(summary, force=False):
+    """Queue a summary for (re)generation
+
+    Returns False without queueing when it is already queued, or when its
+    analysis is up to date with the current reviews and prompt unless force is set.
+    """
+    with transaction.atomic():
+        # Row lock where the database supports it; the status check below is what
+        # makes concurrent refreshes single-flight everywhere, including SQLite
+        current = EmployeeSummary.objects.select_for_update().get(id=summary.id)
+        if current.is_generating:
+            summary.refresh_from_db()
+            return False
+
+        if not force:
+            summary_data = build_summary_data(summary.employee, summary.form)
+            if summary_data is not None and summary_is_current(current, summary_data):
+                return False
+
+        return update_summary_if_status(
+            summary,
+            current.status,
+            status='pending',
+            attempts=0,
+            last_error='',
+            run_after=timezone.now()
+        )
+
+
+def claim_summaries(limit, summary_ids=None):
+    """Atomically move up to limit due summaries from pending to running and return them"""
+    if limit <= 0:
+        return []
+
+    due = EmployeeSummary.objects.filter(status='pending', run_after__lte=timezone.now())
+    if summary_ids is not None:
+        due = due.filter(id__in=summary_ids)
+
+    with transaction.atomic():
+        summary_ids = list(
+            due
+            .select_for_update(skip_locked=True)
+            .order_by('run_after')
+            .values_list('id', flat=True)[:limit]
+        )
+        claimed = []
+        for summary_id in summary_ids:
+            if EmployeeSummary.objects.filter(id=summary_id, status='pending').update(status='running', updated_at=timezone.now()):
+                claimed.append(summary_id)
+
+    return list(
+        EmployeeSummary.objects
+        .filter(id__in=claimed)
+        .select_related('employee', 'form')
+    )
+
+
+def finish_summary(summary, archive_name, analysis, input_hash, max_attempts=SUMMARY_MAX_ATTEMPTS, error=None):
+    """Store a generated analysis, or schedule a retry if generation failed with error"""
+    from .ml_models.api import summary_prompt_version
+    from .rendering import render_analysis, render_version
+
+    if error is None and not (analysis or '').strip():
+        error = 'The LLM returned an empty analysis'
+    if error is not None:
+        fail_summary(summary, error, max_attempts)
+        return False
+
+    # A summary that was released and re-claimed elsewhere in the meantime is left to that worker
+    return update_summary_if_status(
+        summary,
+        'running',
+        summary_file_path=archive_name,
+        gemini_analysis=analysis,
+        analysis_html=render_analysis(analysis),
+        analysis_html_version=render_version(),
+        input_hash=input_hash,
+        prompt_version=summary_prompt_version(),
+        generated_at=timezone.now(),
+        status='ready',
+        attempts=summary.attempts + 1,
+        last_error=''
+    )
+
+
+def stream_summary_generation(summary, max_attempts=SUMMARY_MAX_ATTEMPTS):
+    """Generate a queued summary in the calling request, yielding (event, payload) as text streams in
+
+    Events are 'chunk' with the next piece of Markdown, 'busy' when another request or
+    worker is already generating it, 'waiting' while a failed attempt's backoff runs,
+    'failed', and a final 'done'. 'waiting' and 'failed' carry retry_in, the seconds
+    until the next attempt is due (None once the summary has failed for good). The
+    finished text is stored on the summary exactly as the background worker would store it.
+    """
+    from .ml_models.api import FileProcessor
+
+    if summary.status == 'ready':
+        yield 'done', {'status': summary.status}
+        return
+
+    # Same single-flight claim as the worker, which also waits out the retry backoff
+    if not update_summary_if_status(summary, 'pending', due=True, status='running'):
+        if summary.status == 'pending':
+            yield 'waiting', {'retry_in': summary_retry_in(summary)}
+        else:
+            yield 'busy', {'status': summary.status}
+        return
+
+    finished = False
+    try:
+        summary_data = build_summary_data(summary.employee, summary.form)
+        if summary_data is None:
+            fail_summary(summary, 'No reviews found for this employee', max_attempts)
+            finished = True
+            yield 'failed', {'message': summary.last_error, 'retry_in': summary_retry_in(summary)}
+            return
+
+        input_hash = summary_input_hash(summary_data)
+
+        chunks = []
+        try:
+            for chunk in FileProcessor().stream_data(summary_data):
+                chunks.append(chunk)
+                yield 'chunk', {'text': chunk}
+        except Exception as e:
+            fail_summary(summary, f"Error processing with Gemini API: {str(e)}", max_attempts)
+            finished = True
+            yield 'failed', {'message': summary.last_error, 'retry_in': summary_retry_in(summary)}
+            return
+
+        archive_name = archive_summary_data(summary.employee, summary.form, summary_data)
+        finish_summary(summary, archive_name, ''.join(chunks), input_hash, max_attempts)
+        finished = True
+        yield 'done', {'status': summary.status}
+    finally:
+        # The client went away mid-stream: hand the summary back to the background worker
+        if not finished:
+            update_summary_if_status(summary, 'running', status='pending')
+
+
+def summary_retry_in(summary):
+    """Seconds until a pending summary's next attempt is due, or None when it is not pending"""
+    if summary.status != 'pending':
+        return None
+    return max(0, (summary.run_after - timezone.now()).total_seconds())
+
+
+def fail_summary(summary, error, max_attempts=SUMMARY_MAX_ATTEMPTS):
+    """Schedule a retry with exponential backoff, or give up after max_attempts"""
+    attempts = summary.attempts + 1
+    if attempts >= max_attempts:
+        update_summary_if_status(summary, 'running', status='failed', attempts=attempts, last_error=error)
+    else:
+        update_summary_if_status(
+            summary,
+            'running',
+            status='pending',
+            attempts=attempts,
+            last_error=error,
+            run_after=timezone.now() + timedelta(seconds=SUMMARY_RETRY_DELAY * 2 ** (attempts - 1))
+        )
+
+
+def release_stale_summaries(timeout=900):
+    """Return summaries left running by a worker that died to the queue"""
+    return EmployeeSummary.objects.filter(
+        status='running',
+        updated_at__lt=timezone.now() - timedelta(seconds=timeout)
+    ).update(status='pending', updated_at=timezone.now())
+
+
+def ready_summary_employee_ids(form):
+    """Ids of assigned employees whose peer reviews on form are all complete"""
+    return list(
+        ReviewProgress.objects
+        .filter(form=form, expected__gt=0, completed__gte=F('expected'))
+        .values_list('reviewee_id', flat=True)
+    )
+
+
+def queue_form_summaries(form, force=False):
+    """Queue the summary of every employee on form whose reviews are complete
+
+    Returns (queued, generating, up_to_date) lists of EmployeeSummary objects: newly
+    queued, already pending or running, and ready with an analysis of the current reviews.
+    """
+    queued, generating, up_to_date = [], [], []
+    for employee_id in ready_summary_employee_ids(form):
+        summary, created = EmployeeSummary.objects.select_related('employee', 'form').get_or_create(
+            employee_id=employee_id,
+            form=form
+        )
+        if enqueue_summary(summary, force=force) or created:
+            queued.append(summary)
+        elif summary.is_generating:
+            generating.append(summary)
+        else:
+            up_to_date.append(summary)
+    return queued, generating, up_to_date
+
+
+def submit_summary(pool, summary, max_attempts=SUMMARY_MAX_ATTEMPTS):
+    """Start the LLM call of a claimed summary on pool
+
+    Returns (future, finish), where finish() stores the outcome with finish_summary once
+    the future is done and returns True when the summary was generated. Database work
+    stays on the calling thread, so finish must be called there. Returns None, after
+    failing the attempt, when the employee has no reviews.
+    """
+    summary_data = build_summary_data(summary.employee, summary.form)
+    if summary_data is None:
+        fail_summary(summary, 'No reviews found for this employee', max_attempts)
+        return None
+
+    archive_name = archive_summary_data(summary.employee, summary.form, summary_data)
+    input_hash = summary_input_hash(summary_data)
+    future = pool.submit(process_with_gemini_api, summary_data)
+
+    def finish():
+        analysis, error = future.result()
+        return finish_summary(summary, archive_name, analysis, input_hash, max_attempts, error=error)
+
+    return future, finish
@@ -1,3 +1,1460 @@
-from django.test import TestCase
+import csv
+import gzip
+import hashlib
+import json
+import shutil
+import tempfile
+import joblib
+from io import StringIO
+from datetime import timedelta
+from importlib import import_module
+from unittest import mock, skipUnless
+from django.apps import apps
+from django.conf import settings
+from django.core.management import call_command
+from django.db import connection
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from cachetools import LRUCache
 
-# Create your tests here.
+from .dashboard_cache import cache_stats
+from .exports import export_rows
+from .ml_models import genprocess, registry
+from .ml_models.qpsvc import QuestionClassifier
+from .ml_models.scoring import aggregate_scores, score_answer, score_predictions
+from .ml_models.api import FileProcessor, dedupe_answers, estimate_tokens
+from .ml_models.llm import CircuitBreaker, CircuitOpenError, LLMClient, LLMError, StubBackend, reset_llm_client
+from .models import (
+    CustomUser, EmployeeSummary, EvaluationForm, MLAnalysisJob, PeerReview, ReviewAnswer, ReviewProgress, ScoreRollup,
+    ScoreTrendPoint,
+)
+from .tasks import (
+    ML_JOB_RETRY_DELAY, SUMMARY_RETRY_DELAY, archive_summary_data, build_summary_data, claim_ml_jobs, claim_summaries, enqueue_ml_analysis,
+    enqueue_summary, fail_ml_job, fail_summary, finish_summary, process_with_gemini_api, refresh_score_rollups,
+    release_stale_ml_jobs, release_stale_summaries, run_ml_jobs, store_review_answers, stream_summary_generation,
+    summary_input_hash, update_summary_if_status,
+)
+
+
+# Every test uses a private cache directory, so clearing or filling it never touches the
+# project's shared dashboard cache
+_cache_dir = None
+_cache_override = None
+
+
+def setUpModule():
+    global _cache_dir, _cache_override
+    _cache_dir = tempfile.mkdtemp()
+    _cache_override = override_settings(CACHES={'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': _cache_dir,
+    }})
+    _cache_override.enable()
+
+
+def tearDownModule():
+    _cache_override.disable()
+    shutil.rmtree(_cache_dir, ignore_errors=True)
+
+
+def create_form(admin, employees, title='Form'):
+    form = EvaluationForm.objects.create(
+        title=title,
+        questions=[{'text': 'How punctual is this colleague?'}],
+        created_by=admin
+    )
+    form.assigned_employees.set(employees)
+    return form
+
+
+def create_review(form, reviewer, reviewee):
+    return PeerReview.objects.create(
+        form=form,
+        reviewer=reviewer,
+        reviewee=reviewee,
+        responses={'How punctual is this colleague?': 'Always on time'},
+        ml_status='done'
+    )
+
+
+# Query counts are measured on the uncached build
+@override_settings(DASHBOARD_CACHE_TIMEOUT=0)
+class AdminDashboardTests(TestCase):
+    def setUp(self):
+        self.admin = CustomUser.objects.create_user(username='admin', password='pass', role='admin')
+        self.employees = [
+            CustomUser.objects.create_user(username=f'employee{i}', password='pass', role='employee')
+            for i in range(3)
+        ]
+        self.client.force_login(self.admin)
+
+    def count_dashboard_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('admin_dashboard'))
+        self.assertEqual(response.status_code, 200)
+        return len(queries), response
+
+    def test_statistics(self):
+        form = create_form(self.admin, self.employees)
+        create_review(form, self.employees[0], self.employees[1])
+        create_review(form, self.employees[1], self.employees[0])
+
+        queries, response = self.count_dashboard_queries()
+
+        item = response.context['forms_with_stats'][0]
+        self.assertEqual(item['assigned_employees'], 3)
+        self.assertEqual(item['expected_reviews'], 6)
+        self.assertEqual(item['completed_reviews'], 2)
+        self.assertEqual(response.context['total_reviews'], 2)
+        self.assertEqual(response.context['pending_reviews'], 4)
+
+    def test_query_count_does_not_grow_with_forms(self):
+        form = create_form(self.admin, self.employees)
+        create_review(form, self.employees[0], self.employees[1])
+        single_form_queries, response = self.count_dashboard_queries()
+
+        for i in range(20):
+            form = create_form(self.admin, self.employees, title=f'Form {i}')
+            create_review(form, self.employees[0], self.employees[1])
+        many_forms_queries, response = self.count_dashboard_queries()
+
+        self.assertEqual(len(response.context['forms_with_stats']), 21)
+        self.assertEqual(many_forms_queries, single_form_queries)
+
+
+class AdminSummariesListTests(TestCase):
+    def setUp(self):
+        self.admin = CustomUser.objects.create_user(username='admin', password='pass', role='admin')
+        self.employees = [
+            CustomUser.objects.create_user(username=f'employee{i}', password='pass', role='employee')
+            for i in range(8)
+        ]
+        self.client.force_login(self.admin)
+
+    def get_list(self, form):
+        return self.client.get(reverse('admin_summaries_list', args=[form.id]))
+
+    def test_query_count_does_not_grow_with_employees(self):
+        small_form = create_form(self.admin, self.employees[:2], title='Small')
+        create_review(small_form, self.employees[0], self.employees[1])
+        with CaptureQueriesContext(connection) as small_queries:
+            self.get_list(small_form)
+
+        form = create_form(self.admin, self.employees, title='Large')
+        # Reviews and summaries on another form must not leak into this one's counts
+        other_form = create_form(self.admin, self.employees, title='Other')
+        for reviewer in self.employees[1:4]:
+            create_review(form, reviewer, self.employees[0])
+            create_review(other_form, reviewer, self.employees[0])
+        EmployeeSummary.objects.create(employee=self.employees[0], form=form, status='ready', gemini_analysis='Great')
+        EmployeeSummary.objects.create(employee=self.employees[1], form=form)
+        EmployeeSummary.objects.create(employee=self.employees[2], form=other_form, status='ready', gemini_analysis='Ok')
+
+        with self.assertNumQueries(len(small_queries)):
+            response = self.get_list(form)
+
+        rows = {row['employee'].username: row for row in response.context['employees_data']}
+        self.assertEqual(len(rows), 8)
+        self.assertEqual((rows['employee0']['reviews_completed'], rows['employee0']['expected_reviews']), (3, 7))
+        self.assertTrue(rows['employee0']['has_summary'])
+        self.assertEqual(rows['employee1']['summary'].status, 'pending')
+        self.assertFalse(rows['employee1']['has_summary'])
+        self.assertIsNone(rows['employee2']['summary'])
+        self.assertEqual(rows['employee2']['reviews_completed'], 0)
+
+    def test_viewing_never_queues_summaries(self):
+        form = create_form(self.admin, self.employees[:2])
+        create_review(form, self.employees[0], self.employees[1])
+        create_review(form, self.employees[1], self.employees[0])
+
+        self.get_list(form)
+
+        self.assertFalse(EmployeeSummary.objects.exists())
+
+
+@override_settings(DASHBOARD_CACHE_TIMEOUT=0)
+class EmployeeDashboardTests(TestCase):
+    # Session and user lookups, the session save (3 queries), then forms,
+    # assignees, reviewed pairs and completed reviews
+    QUERY_BUDGET = 9
+
+    def setUp(self):
+        self.admin = CustomUser.objects.create_user(username='admin', password='pass', role='admin')
+        self.employees = [
+            CustomUser.objects.create_user(username=f'employee{i}', password='pass', role='employee')
+            for i in range(4)
+        ]
+        self.employee = self.employees[0]
+        self.client.force_login(self.employee)
+
+    def create_forms(self, count):
+        for i in range(count):
+            form = create_form(self.admin, self.employees, title=f'Form {i}')
+            create_review(form, self.employee, self.employees[1])
+            create_review(form, self.employees[2], self.employee)
+
+    def get_dashboard(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('employee_dashboard'))
+        self.assertEqual(response.status_code, 200)
+        return len(queries), response
+
+    def test_progress(self):
+        self.create_forms(1)
+
+        queries, response = self.get_dashboard()
+
+        item = response.context['forms_with_colleagues'][0]
+        self.assertEqual(item['total_colleagues'], 3)
+        self.assertEqual(item['reviewed_count'], 1)
+        self.assertEqual([colleague.username for colleague in item['pending_colleagues']], ['employee2', 'employee3'])
+        self.assertEqual(len(response.context['completed_reviews']), 1)
+
+    def test_query_budget_with_one_form(self):
+        self.create_forms(1)
+        queries, response = self.get_dashboard()
+        self.assertLessEqual(queries, self.QUERY_BUDGET)
+
+    def test_query_budget_with_fifty_forms(self):
+        self.create_forms(50)
+        queries, response = self.get_dashboard()
+        self.assertEqual(len(response.context['forms_with_colleagues']), 50)
+        self.assertLessEqual(queries, self.QUERY_BUDGET)
+
+
+class ReviewProgressTests(TestCase):
+    def setUp(self):
+        self.admin = CustomUser.objects.create_user(username='admin', password='pass', role='admin')
+        self.employees = [
+            CustomUser.objects.create_user(username=f'employee{i}', password='pass', role='employee')
+            for i in range(3)
+        ]
+        self.form = create_form(self.admin, self.employees)
+
+    def progress(self, employee):
+        row = ReviewProgress.objects.get(form=self.form, reviewee=employee)
+        return row.completed, row.expected
+
+    def test_reviews_update_the_counters(self):
+        review = create_review(self.form, self.employees[0], self.employees[1])
+        create_review(self.form, self.employees[2], self.employees[1])
+        self.assertEqual(self.progress(self.employees[1]), (2, 2))
+        self.assertTrue(ReviewProgress.objects.get(form=self.form, reviewee=self.employees[1]).is_complete)
+
+        review.delete()
+        self.assertEqual(self.progress(self.employees[1]), (1, 2))
+
+    def test_reviews_from_unassigned_employees_do_not_count(self):
+        outsider = CustomUser.objects.create_user(username='outsider', password='pass', role='employee')
+        create_review(self.form, outsider, self.employees[0])
+        self.assertEqual(self.progress(self.employees[0]), (0, 2))
+
+    def test_assignment_changes_rebuild_the_counters(self):
+        create_review(self.form, self.employees[0], self.employees[1])
+        newcomer = CustomUser.objects.create_user(username='newcomer', password='pass', role='employee')
+
+        self.form.assigned_employees.add(newcomer)
+        self.assertEqual(self.progress(self.employees[1]), (1, 3))
+        self.assertEqual(self.progress(newcomer), (0, 3))
+
+        self.form.assigned_employees.remove(self.employees[0])
+        self.assertEqual(self.progress(self.employees[1]), (0, 2))
+        self.assertFalse(ReviewProgress.objects.filter(form=self.form, reviewee=self.employees[0]).exists())
+
+    def test_rebuild_repairs_drifted_counters(self):
+        create_review(self.form, self.employees[0], self.employees[1])
+        ReviewProgress.objects.filter(form=self.form).update(completed=7, expected=0)
+
+        ReviewProgress.rebuild(self.form)
+
+        self.assertEqual(self.progress(self.employees[1]), (1, 2))
+        self.assertEqual(self.progress(self.employees[0]), (0, 2))
+
+
+class DashboardCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.admin = CustomUser.objects.create_user(username='admin', password='pass', role='admin')
+        self.employees = [
+            CustomUser.objects.create_user(username=f'employee{i}', password='pass', role='employee')
+            for i in range(3)
+        ]
+        self.form = create_form(self.admin, self.employees)
+
+    def get(self, user, url_name, *args):
+        self.client.force_login(user)
+        response = self.client.get(reverse(url_name, args=args))
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_repeat_visits_are_served_from_cache(self):
+        self.get(self.admin, 'admin_dashboard')
+        self.get(self.admin, 'admin_dashboard')
+        self.assertEqual(cache_stats()['admin'], {'hits': 1, 'misses': 1})
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_per_process_cache_is_not_used(self):
+        self.get(self.admin, 'admin_dashboard')
+        with self.captureOnCommitCallbacks(execute=True):
+            create_review(self.form, self.employees[0], self.employees[1])
+        self.assertEqual(self.get(self.admin, 'admin_dashboard').context['total_reviews'], 1)
+        self.assertEqual(cache_stats()['admin'], {'hits': 0, 'misses': 0})
+
+    def test_submitted_review_invalidates_affected_dashboards(self):
+        reviewer, reviewee, bystander = self.employees
+        self.get(self.admin, 'admin_dashboard')
+        self.get(self.admin, 'reviewee_reviews', self.form.id, reviewee.id)
+        self.get(self.admin, 'reviewee_reviews', self.form.id, bystander.id)
+        self.get(reviewer, 'employee_dashboard')
+        self.get(bystander, 'employee_dashboard')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            create_review(self.form, reviewer, reviewee)
+
+        self.assertEqual(self.get(self.admin, 'admin_dashboard').context['total_reviews'], 1)
+        self.assertEqual(len(self.get(self.admin, 'reviewee_reviews', self.form.id, reviewee.id).context['reviews']), 1)
+        self.get(self.admin, 'reviewee_reviews', self.form.id, bystander.id)
+        self.assertEqual(self.get(reviewer, 'employee_dashboard').context['forms_with_colleagues'][0]['reviewed_count'], 1)
+        self.get(bystander, 'employee_dashboard')
+
+        stats = cache_stats()
+        self.assertEqual(stats['admin'], {'hits': 0, 'misses': 2})
+        # Only the reviewee's review list and the reviewer's dashboard were dropped
+        self.assertEqual(stats['reviews'], {'hits': 1, 'misses': 3})
+        self.assertEqual(stats['employee'], {'hits': 1, 'misses': 3})
+
+    def test_assignment_change_invalidates_assignee_dashboards(self):
+        newcomer = CustomUser.objects.create_user(username='newcomer', password='pass', role='employee')
+        self.assertEqual(self.get(self.employees[0], 'employee_dashboard').context['forms_with_colleagues'][0]['total_colleagues'], 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.form.assigned_employees.add(newcomer)
+
+        self.assertEqual(self.get(self.employees[0], 'employee_dashboard').context['forms_with_colleagues'][0]['total_colleagues'], 3)
+        self.assertEqual(len(self.get(newcomer, 'employee_dashboard').context['forms_with_colleagues']), 1)
+
+
+@override_settings(DASHBOARD_CACHE_TIMEOUT=0)
+class ViewReviewsTests(TestCase):
+    def setUp(self):
+        self.admin = CustomUser.objects.create_user(username='admin', password='pass', role='admin')
+        self.employees = [
+            CustomUser.objects.create_user(username=f'employee{i}', password='pass', role='employee')
+            for i in range(25)
+        ]
+        self.form = create_form(self.admin, self.employees)
+        for reviewee in self.employees:
+            create_review(self.form, self.employees[0] if reviewee != self.employees[0] else self.employees[1], reviewee)
+        self.client.force_login(self.admin)
+
+    def get_page(self, after=None):
+        url = reverse('view_reviews', args=[self.form.id])
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, {'after': after} if after else {})
+        self.assertEqual(response.status_code, 200)
+        return queries, response
+
+    def test_pages_cover_every_reviewee_once(self):
+        seen = []
+        after = None
+        page_queries = set()
+        while True:
+            queries, response = self.get_page(after)
+            page_queries.add(len(queries))
+            seen += [item['reviewee'] for item in response.context['reviewees']]
+            after = response.context['next_after']
+            if after is None:
+                break
+
+        self.assertEqual(seen, self.employees)
+        self.assertEqual(len(page_queries), 1)
+        self.assertContains(response, '← First page')
+
+    def test_page_does_not_load_review_json(self):
+        queries, response = self.get_page()
+        self.assertEqual(len(response.context['reviewees']), 10)
+        self.assertEqual(response.context['reviewees'][0]['review_count'], 1)
+        self.assertFalse(any('"responses"' in query['sql'] for query in queries))
+
+    def test_reviewee_reviews_fragment(self):
+        response = self.client.get(reverse('reviewee_reviews', args=[self.form.id, self.employees[1].id]))
+        self.assertContains(response, 'Review by employee0')
+        self.assertContains(response, 'Always on time')
+
+    def test_other_admins_forms_are_not_found(self):
+        other = CustomUser.objects.create_user(username='other', password='pass', role='admin')
+        self.client.force_login(other)
+        response = self.client.get(reverse('reviewee_reviews', args=[self.form.id, self.employees[1].id]))
+        self.assertEqual(response.status_code, 404)
+
+
+def classify_by_keyword(questions):
+    return [('Punctuality', 1.5) if 'punctual' in question else ('Out of Scope', 0.0) for question in questions]
+
+
+@mock.patch('evaluation.ml_models.analysis.QuestionClassifier')
+class QuestionCategoryTests(TestCase):
+    def setUp(self):
+        self.admin = CustomUser.objects.create_user(username='admin', password='pass', role='admin')
+        self.client.force_login(self.admin)
+
+    def create_form(self):
+        return self.client.post(reverse('create_form'), {
+            'title': 'Form',
+            'questions': 'How punctual is this colleague?\nAnything else?\n',
+        }, follow=True)
+
+    def test_create_form_stores_categories(self, classifier):
+        classifier.return_value.classify_batch.side_effect = classify_by_keyword
+
+        self.create_form()
+
+        self.assertEqual(EvaluationForm.objects.get().questions, [
+            {'text': 'How punctual is this colleague?', 'category': 'Punctuality', 'confidence': 1.5},
+            {'text': 'Anything else?', 'category': 'Out of Scope', 'confidence': 0.0},
+        ])
+
+    def test_create_form_survives_classifier_errors(self, classifier):
+        classifier.side_effect = OSError('artifact missing')
+
+        with self.assertLogs('evaluation.views', 'ERROR'):
+            response = self.create_form()
+
+        self.assertEqual(EvaluationForm.objects.get().questions, [
+            {'text': 'How punctual is this colleague?'}, {'text': 'Anything else?'},
+        ])
+        self.assertIn('could not be categorised', [str(message) for message in response.context['messages']][0])
+
+    def test_backfill_command_fills_missing_categories(self, classifier):
+        classifier.return_value.classify_batch.side_effect = classify_by_keyword
+        form = create_form(self.admin, [])
+        form.questions = [
+            {'text': 'How punctual is this colleague?'},
+            {'text': 'Anything else?', 'category': 'Communication', 'confidence': 1.2},
+        ]
+        form.save()
+
+        call_command('backfill_question_categories', stdout=StringIO())
+        form.refresh_from_db()
+        self.assertEqual([question['category'] for question in form.questions], ['Punctuality', 'Communication'])
+
+        call_command('backfill_question_categories', force=True, stdout=StringIO())
+        form.refresh_from_db()
+        self.assertEqual([question['category'] for question in form.questions], ['Punctuality', 'Out of Scope'])
+
+
+@override_settings(ML_MODEL_VERSION=None, ML_ARTIFACT_DIR='/nonexistent')
+class PipelineCacheTests(TestCase):
+    def setUp(self):
+        genprocess.invalidate_pipeline_cache()
+        self.addCleanup(genprocess.invalidate_pipeline_cache)
+        self.brain = genprocess.Brain()
+
+    def test_classifier_labels_use_the_dataset_column(self):
+        with mock.patch.object(genprocess.Brain, 'train', wraps=self.brain.train) as train:
+            self.assertIsNotNone(self.brain.get_pipeline('Help_Others'))
+            self.assertIsNotNone(self.brain.get_pipeline('Helps_Others'))
+        train.assert_called_once_with('Helps_Others')
+
+    def test_unknown_columns_are_cached(self):
+        with mock.patch.object(genprocess.Brain, 'train', return_value=None) as train:
+            self.assertIsNone(self.brain.get_pipeline('Salary'))
+            self.assertEqual(self.brain.brain_batch([('Salary', 'a'), ('Salary', 'b')]), ['Column not found in dataset'] * 2)
+        self.assertEqual(train.call_count, 1)
+
+    def test_least_recently_used_pipeline_is_evicted(self):
+        with mock.patch.object(genprocess, '_pipeline_cache', LRUCache(maxsize=2)), \
+                mock.patch.object(genprocess.Brain, 'train', side_effect=lambda column: object()) as train:
+            for column in ['Punctuality', 'Cooperation', 'Punctuality', 'Leadership']:
+                self.brain.get_pipeline(column)
+            self.assertEqual(train.call_count, 3)
+
+            # Cooperation was the least recently used of the three
+            self.brain.get_pipeline('Punctuality')
+            self.brain.get_pipeline('Cooperation')
+            self.assertEqual(train.call_count, 4)
+
+    def test_invalidate_drops_every_pipeline(self):
+        with mock.patch.object(genprocess.Brain, 'train', side_effect=lambda column: object()) as train:
+            first = self.brain.get_pipeline('Punctuality')
+            self.assertIs(self.brain.get_pipeline('Punctuality'), first)
+
+            genprocess.invalidate_pipeline_cache()
+
+            self.assertIsNot(self.brain.get_pipeline('Punctuality'), first)
+        self.assertEqual(train.call_count, 2)
+
+
+@override_settings(ML_MODEL_VERSION=None, ML_ARTIFACT_DIR='/nonexistent')
+class BatchAnalysisTests(TestCase):
+    def setUp(self):
+        genprocess.invalidate_pipeline_cache()
+        self.addCleanup(genprocess.invalidate_pipeline_cache)
+
+    def test_classify_batch_matches_classify(self):
+        classifier = QuestionClassifier()
+        # Raised so that the vague greeting falls below it and is Out of Scope
+        classifier.threshold = 1.0
+        questions = ['How punctual is this colleague?', 'How well do they help others?', 'Hello']
+
+        batched = classifier.classify_batch(questions)
+
+        self.assertEqual(batched, [classifier.classify(question) for question in questions])
+        self.assertEqual(batched[2], ('Out of Scope', 0.0))
+        self.assertEqual(classifier.classify_batch([]), [])
+
+    def test_brain_batch_matches_brain_with_one_predict_per_category(self):
+        brain = genprocess.Brain()
+        items = [
+            ('Punctuality', 'Always on time for meetings'),
+            ('Help_Others', 'Rarely offers help'),
+            ('Out of Scope', 'Great to work with!'),
+            ('Punctuality', 'Often late to standups'),
+            ('Salary', 'Paid well'),
+        ]
+        # Fixed sentiment scores, so the test does not need the VADER lexicon download
+        analyzer = mock.patch.object(genprocess, 'SentimentIntensityAnalyzer')
+        analyzer.start().return_value.polarity_scores.side_effect = lambda comment: {'compound': len(comment) / 100}
+        self.addCleanup(analyzer.stop)
+        expected = [brain.brain(column, comment) for column, comment in items]
+
+        pipelines = {}
+
+        def spy_pipeline(column):
+            pipeline = genprocess.Brain.get_pipeline(brain, column)
+            return pipelines.setdefault(column, mock.Mock(wraps=pipeline)) if pipeline is not None else None
+
+        with mock.patch.object(brain, 'get_pipeline', spy_pipeline):
+            batched = brain.brain_batch(items)
+
+        self.assertEqual(batched, expected)
+        self.assertIsInstance(batched[2], dict)
+        self.assertEqual(batched[4], 'Column not found in dataset')
+        self.assertEqual({column: pipeline.predict.call_count for column, pipeline in pipelines.items()}, {
+            'Punctuality': 1,
+            'Help_Others': 1,
+        })
+
+
+def classify_as_punctuality(questions, force=False):
+    for question in questions:
+        question.setdefault('category', 'Punctuality')
+        question.setdefault('confidence', 90.0)
+    return len(questions)
+
+
+@mock.patch('evaluation.ml_models.analysis.classify_questions', classify_as_punctuality)
+class MLQueueTests(TestCase):
+    def setUp(self):
+        self.admin = CustomUser.objects.create_user(username='admin', password='pass', role='admin')
+        self.employees = [
+            CustomUser.objects.create_user(username=f'employee{i}', password='pass', role='employee')
+            for i in range(2)
+        ]
+        self.form = create_form(self.admin, self.employees)
+        self.review = create_review(self.form, self.employees[0], self.employees[1])
+        self.job = enqueue_ml_analysis(self.review)
+
+    def make_due(self):
+        MLAnalysisJob.objects.filter(id=self.job.id).update(run_after=timezone.now())
+
+    def test_failing_model_is_retried_then_marked_failed(self):
+        with mock.patch('evaluation.ml_models.analysis.Brain') as brain:
+            brain.return_value.brain_batch.side_effect = lambda items: [ValueError('model broke')] * len(items)
+
+            self.assertEqual(run_ml_jobs(max_attempts=2), 0)
+            self.job.refresh_from_db()
+            self.assertEqual(self.job.status, 'pending')
+            self.assertEqual(self.job.attempts, 1)
+            self.assertIn('model broke', self.job.last_error)
+            self.assertGreater(self.job.run_after, timezone.now())
+            # Backing off: nothing is due
+            self.assertEqual(run_ml_jobs(max_attempts=2), 0)
+            self.assertEqual(brain.return_value.brain_batch.call_count, 1)
+
+            self.make_due()
+            run_ml_jobs(max_attempts=2)
+
+        self.job.refresh_from_db()
+        self.review.refresh_from_db()
+        self.assertEqual(self.job.status, 'failed')
+        self.assertEqual(self.job.attempts, 2)
+        self.assertEqual(self.review.ml_status, 'failed')
+        self.assertIsNone(self.review.ml_analysis)
+        self.assertFalse(ReviewAnswer.objects.exists())
+
+    def test_model_loading_error_fails_the_attempt(self):
+        with mock.patch('evaluation.ml_models.analysis.Brain', side_effect=OSError('artifact missing')):
+            run_ml_jobs()
+
+        self.job.refresh_from_db()
+        self.assertEqual(self.job.status, 'pending')
+        self.assertIn('artifact missing', self.job.last_error)
+        self.assertEqual(PeerReview.objects.get(id=self.review.id).ml_status, 'pending')
+
+    def test_successful_analysis_is_stored(self):
+        with mock.patch('evaluation.ml_models.analysis.Brain') as brain:
+            brain.return_value.brain_batch.side_effect = lambda items: ['Always on time'] * len(items)
+            self.assertEqual(run_ml_jobs(), 1)
+
+        self.job.refresh_from_db()
+        self.review.refresh_from_db()
+        self.assertEqual(self.job.status, 'done')
+        self.assertEqual(self.review.ml_status, 'done')
+        self.assertEqual(
+            self.review.ml_analysis['How punctual is this colleague?']['prediction'],
+            'Always on time'
+        )
+        self.assertEqual(ReviewAnswer.objects.get(review=self.review).score, 5.0)
+
+    def test_failed_write_counts_one_attempt(self):
+        with mock.patch('evaluation.ml_models.analysis.Brain') as brain, \
+                mock.patch('evaluation.tasks.store_review_answers', side_effect=RuntimeError('disk full')):
+            brain.return_value.brain_batch.side_effect = lambda items: ['Always on time'] * len(items)
+            self.assertEqual(run_ml_jobs(), 0)
+
+        self.job.refresh_from_db()
+        self.assertEqual((self.job.status, self.job.attempts), ('pending', 1))
+        self.assertIn('disk full', self.job.last_error)
+        self.assertEqual(PeerReview.objects.get(id=self.review.id).ml_status, 'pending')
+
+    def test_out_of_scope_answers_store_their_sentiment(self):
+        scores = {'neg': 0.5, 'neu': 0.5, 'pos': 0.0, 'compound': -0.42}
+        self.form.questions = [{'text': 'How punctual is this colleague?', 'category': 'Out of Scope', 'confidence': 0.0}]
+        self.form.save()
+
+        with mock.patch('evaluation.ml_models.analysis.Brain') as brain:
+            brain.return_value.brain_batch.side_effect = lambda items: [scores] * len(items)
+            self.assertEqual(run_ml_jobs(), 1)
+
+        result = PeerReview.objects.get(id=self.review.id).ml_analysis['How punctual is this colleague?']
+        self.assertEqual(result['sentiment'], -0.42)
+        self.assertEqual(ReviewAnswer.objects.get(review=self.review).sentiment, -0.42)
+
+    def test_claim_takes_only_due_pending_jobs(self):
+        backing_off = enqueue_ml_analysis(create_review(self.form, self.employees[1], self.employees[0]))
+        MLAnalysisJob.objects.filter(id=backing_off.id).update(run_after=timezone.now() + timedelta(minutes=5))
+
+        self.assertEqual([job.id for job in claim_ml_jobs(10)], [self.job.id])
+        self.assertEqual(MLAnalysisJob.objects.get(id=self.job.id).status, 'running')
+        # A claimed job is not handed to a second worker
+        self.assertEqual(claim_ml_jobs(10), [])
+
+    def test_retry_delay_doubles_until_failed(self):
+        for attempt in range(1, 3):
+            before = timezone.now()
+            fail_ml_job(self.job, 'timeout', max_attempts=3)
+            self.assertEqual((self.job.status, self.job.attempts), ('pending', attempt))
+            delay = (self.job.run_after - before).total_seconds()
+            self.assertAlmostEqual(delay, ML_JOB_RETRY_DELAY * 2 ** (attempt - 1), delta=5)
+
+        fail_ml_job(self.job, 'timeout', max_attempts=3)
+        self.assertEqual(MLAnalysisJob.objects.get(id=self.job.id).status, 'failed')
+        self.assertEqual(PeerReview.objects.get(id=self.review.id).ml_status, 'failed')
+
+    def test_stale_running_jobs_are_released(self):
+        claim_ml_jobs(10)
+        self.assertEqual(release_stale_ml_jobs(timeout=600), 0)
+
+        MLAnalysisJob.objects.filter(id=self.job.id).update(updated_at=timezone.now() - timedelta(minutes=11))
+        self.assertEqual(release_stale_ml_jobs(timeout=600), 1)
+        self.assertEqual(MLAnalysisJob.objects.get(id=self.job.id).status, 'pending')
+
+
+class ModelRegistryTests(TestCase):
+    def setUp(self):
+        artifact_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(artifact_dir.cleanup)
+        self.dataset = f'{artifact_dir.name}/answers.csv'
+        with open(self.dataset, 'w') as f:
+            f.write('Punctuality\nAlways on time (Always on time)\n')
+
+        settings_override = override_settings(ML_ARTIFACT_DIR=f'{artifact_dir.name}/artifacts', ML_MODEL_VERSION=None)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.addCleanup(registry.clear_loaded_models)
+
+    def test_model_is_only_served_for_the_dataset_it_was_trained_on(self):
+        registry.save_models(
+            {'category_Punctuality': {'fitted': True}},
+            metadata={registry.ANSWER_DATASET_HASH: registry.file_sha256(self.dataset)}
+        )
+        self.assertEqual(registry.load_model('category_Punctuality', dataset_path=self.dataset), {'fitted': True})
+
+        with open(self.dataset, 'a') as f:
+            f.write('Late again (Frequently late)\n')
+        self.assertIsNone(registry.load_model('category_Punctuality', dataset_path=self.dataset))
+
+    def test_missing_models_are_not_cached(self):
+        version = registry.save_models({})
+        self.assertIsNone(registry.load_model('category_Punctuality'))
+
+        # Written straight to the version directory, without save_models clearing the loaded models
+        joblib.dump({'fitted': True}, f'{registry.get_artifact_root()}/{version}/category_Punctuality.joblib')
+        self.assertEqual(registry.load_model('category_Punctuality'), {'fitted': True})
+
+
+class ScoringTests(TestCase):
+    def test_score_answer(self):
+        self.assertEqual(score_answer('Punctuality', ' Always On Time '), ('Punctuality', 5.0, 'Excellent'))
+        self.assertEqual(score_answer('Helps_Others', 'Rarely'), ('Helps_Others', 2.0, 'Needs Improvement'))
+        self.assertEqual(score_answer('Punctuality', 'whenever'), ('Punctuality', None, ''))
+        self.assertEqual(score_answer('Areas_to_Improve', 'communication'), ('Areas_to_Improve', None, ''))
+
+    def test_score_predictions_drops_errors_and_unknown_labels(self):
+        frame = score_predictions([
+            (1, {
+                'q1': {'category': 'Punctuality', 'prediction': 'Usually on time'},
+                'q2': {'category': 'Punctuality', 'prediction': 'whenever'},
+                'q3': {'error': 'model broke'},
+            }),
+            (2, None),
+        ])
+
+        self.assertEqual(frame[['reviewee_id', 'category', 'score', 'rating']].values.tolist(), [
+            [1, 'Punctuality', 4.0, 'Good'],
+        ])
+
+    @override_settings(ML_MODEL_VERSION=None, ML_ARTIFACT_DIR='/nonexistent')
+    def test_every_label_the_answer_models_emit_is_scored(self):
+        genprocess.invalidate_pipeline_cache()
+        self.addCleanup(genprocess.invalidate_pipeline_cache)
+        brain = genprocess.Brain()
+
+        for column in brain.load_dataset().columns.str.strip():
+            if column == 'Areas_to_Improve':
+                continue
+            for label in brain.get_pipeline(column).classes_:
+                with self.subTest(column=column, label=label):
+                    self.assertIsNotNone(score_answer(column, label)[1])
+
+        # The classifier's Help_Others category is predicted and stored under its dataset column
+        label = brain.brain_batch([('Help_Others', 'Always willing to help the team')])[0]
+        self.assertEqual(score_answer(genprocess.dataset_column('Help_Others'), label)[0], 'Helps_Others')
+        self.assertIsNotNone(score_answer('Helps_Others', label)[1])
+
+    def test_aggregate_scores_matches_score_answer(self):
+        rows = [
+            (1, {'q1': {'category': 'Punctuality', 'prediction': 'Always on time'},
+                 'q2': {'category': 'Helps_Others', 'prediction': 'Sometimes'}}),
+            (1, {'q1': {'category': 'Punctuality', 'prediction': 'Frequently late'}}),
+            (2, {'q1': {'category': 'Work_Ethics', 'prediction': 'Good'}}),
+        ]
+
+        rollups = aggregate_scores(rows)
+
+        self.assertEqual(rollups[1]['overall_score'], round((5 + 3 + 2) / 3, 2))
+        self.assertEqual(rollups[1]['answer_count'], 3)
+        self.assertEqual(rollups[1]['category_scores'], {'Helps_Others': 3.0, 'Punctuality': 3.5})
+        self.assertEqual(rollups[1]['category_answer_counts'], {'Helps_Others': 1, 'Punctuality': 2})
+        self.assertEqual(
+            rollups[1]['rating_counts'],
+            {'Excellent': 1, 'Good': 0, 'Average': 1, 'Needs Improvement': 1}
+        )
+        self.assertEqual(rollups[2]['overall_score'], score_answer('Work_Ethics', 'Good')[1])
+        self.assertEqual(aggregate_scores([]), {})
+
+
+class FlakyBackend(StubBackend):
+    """Stub backend raising the queued errors before answering"""
+
+    def __init__(self, errors):
+        super().__init__()
+        self.errors = list(errors)
+        self.calls = 0
+
+    def generate(self, prompt, timeout):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return super().generate(prompt, timeout)
+
+
+class HTTPError(Exception):
+    def __init__(self, code):
+        super().__init__(f'HTTP {code}')
+        self.code = code
+
+
+class LLMClientTests(TestCase):
+    def client_for(self, errors, **kwargs):
+        backend = FlakyBackend(errors)
+        return backend, LLMClient(backend, backoff=0, **kwargs)
+
+    def test_transient_errors_are_retried(self):
+        backend, client = self.client_for([TimeoutError(), HTTPError(429), HTTPError(503)], max_retries=3)
+        self.assertIn('PERFORMANCE SUMMARY', client.generate('prompt'))
+        self.assertEqual(backend.calls, 4)
+
+    def test_retries_are_bounded(self):
+        backend, client = self.client_for([HTTPError(500)] * 5, max_retries=2)
+        with self.assertRaises(LLMError):
+            client.generate('prompt')
+        self.assertEqual(backend.calls, 3)
+
+    def test_client_errors_are_not_retried(self):
+        for code in (400, 401, 403):
+            backend, client = self.client_for([HTTPError(code)], max_retries=2)
+            with self.assertRaises(LLMError):
+                client.generate('prompt')
+            self.assertEqual(backend.calls, 1)
+            self.assertEqual(client.breaker.failures, 0)
+
+    def test_every_attempt_waits_for_the_rate_limiter(self):
+        rate_limiter = mock.Mock()
+        backend, client = self.client_for([TimeoutError()], max_retries=1, rate_limiter=rate_limiter)
+        client.generate('prompt')
+        list(client.stream('prompt'))
+        self.assertEqual(rate_limiter.wait.call_count, 3)
+
+    def test_circuit_opens_after_repeated_failures_and_half_opens(self):
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+        backend, client = self.client_for([TimeoutError(), TimeoutError()], max_retries=1, breaker=breaker)
+        with self.assertRaises(LLMError):
+            client.generate('prompt')
+
+        with self.assertRaises(CircuitOpenError):
+            client.generate('prompt')
+        self.assertEqual(backend.calls, 2)
+
+        # After the reset timeout one trial call goes through and closes the circuit
+        breaker.opened_at -= 60
+        client.generate('prompt')
+        self.assertEqual(breaker.failures, 0)
+        self.assertTrue(breaker.allow())
+
+
+class DedupeAnswersTests(TestCase):
+    def test_near_identical_answers_keep_every_reviewer(self):
+        answers = [
+            'Always on time (by a)',
+            'always on time. (by b)',
+            'Always on tine (by c)',
+            'Often late to meetings (by d)',
+        ]
+        self.assertEqual(dedupe_answers(answers), ['Always on time (by a, b, c)', 'Often late to meetings (by d)'])
+
+    def test_answers_without_reviewer(self):
+        self.assertEqual(dedupe_answers(['Great', 'great!', 'Poor']), ['Great', 'Poor'])
+
+    def test_large_inputs_only_merge_exact_matches(self):
+        answers = [f'Answer number {i} (by r{i})' for i in range(150)] + ['Answer number 0 (by x)', 'Answer numbr 1 (by y)']
+        deduped = dedupe_answers(answers)
+        self.assertEqual(deduped[0], 'Answer number 0 (by r0, x)')
+        self.assertEqual(len(deduped), 151)
+
+
+class EchoBackend(StubBackend):
+    """Stub backend answering every prompt with a digest of the given length"""
+
+    def __init__(self, digest_chars):
+        super().__init__()
+        self.digest_chars = digest_chars
+        self.calls = 0
+
+    def generate(self, prompt, timeout):
+        self.calls += 1
+        return 'x' * self.digest_chars
+
+
+@override_settings(SUMMARY_PROMPT_TOKEN_BUDGET=2000, SUMMARY_MAP_CONCURRENCY=2)
+class PromptBudgetTests(TestCase):
+    def processor(self, backend):
+        processor = FileProcessor.__new__(FileProcessor)
+        processor.client = LLMClient(backend)
+        return processor
+
+    def review_data(self, reviewers, answer_chars=200):
+        return {
+            'name': 'employee',
+            'questions': [
+                {
+                    'question': f'Question {q}',
+                    # Distinct words per answer, so deduplication cannot shrink them
+                    'answers': [
+                        ' '.join(hashlib.md5(f'{q}-{i}-{w}'.encode()).hexdigest()[:6] for w in range(answer_chars // 7))
+                        + f' (by r{i})'
+                        for i in range(reviewers)
+                    ],
+                }
+                for q in range(3)
+            ],
+        }
+
+    def test_small_review_sets_use_the_single_pass_prompt(self):
+        backend = EchoBackend(100)
+        processor = self.processor(backend)
+        data = self.review_data(3)
+
+        self.assertEqual(processor.build_budgeted_prompt(data), processor.build_prompt(data))
+        self.assertEqual(backend.calls, 0)
+
+    def test_large_review_sets_are_condensed_into_the_budget(self):
+        backend = EchoBackend(300)
+        prompt = self.processor(backend).build_budgeted_prompt(self.review_data(100))
+
+        self.assertLessEqual(estimate_tokens(prompt), 2000)
+        self.assertIn('SUMMARY OF 100 PEER RESPONSES', prompt)
+        self.assertGreater(backend.calls, 3)
+
+    def test_oversized_digests_stop_after_a_bounded_number_of_rounds(self):
+        # Every digest is larger than a chunk, so condensing never shrinks the parts
+        backend = EchoBackend(6000)
+        prompt = self.processor(backend).build_budgeted_prompt(self.review_data(100))
+
+        self.assertLessEqual(estimate_tokens(prompt), 2000)
+        self.assertLess(backend.calls, 200)
+
+
+class ReviewAnswerTests(TestCase):
+    QUESTIONS = ['How punctual is this colleague?', 'How well do they help others?', 'What should they improve?']
+
+    def setUp(self):
+        self.admin = CustomUser.objects.create_user(username='admin', password='pass', role='admin')
+        self.employees = [
+            CustomUser.objects.create_user(username=f'employee{i}', password='pass', role='employee')
+            for i in range(3)
+        ]
+        self.form = create_form(self.admin, self.employees)
+        self.form.questions = [{'text': question} for question in self.QUESTIONS]
+        self.form.save()
+
+    def analysed_review(self, reviewer, reviewee, punctuality, helpfulness, form=None):
+        review = create_review(form or self.form, reviewer, reviewee)
+        review.ml_analysis = {
+            self.QUESTIONS[0]: {'category': 'Punctuality', 'confidence': 91.0, 'prediction': punctuality},
+            self.QUESTIONS[1]: {'category': 'Helps_Others', 'confidence': 80.0, 'prediction': helpfulness},
+            self.QUESTIONS[2]: {'error': 'model unavailable'},
+        }
+        review.save()
+        return review
+
+    def test_answers_are_written_from_the_analysis(self):
+        review = self.analysed_review(self.employees[0], self.employees[1], 'Always on time', 'Sometimes')
+
+        self.assertEqual(store_review_answers([review]), 3)
+        self.assertEqual(store_review_answers([review]), 3)
+
+        answers = list(review.answers.order_by('question_index').values_list(
+            'question_index', 'category', 'prediction', 'score', 'rating'
+        ))
+        self.assertEqual(answers, [
+            (0, 'Punctuality', 'Always on time', 5.0, 'Excellent'),
+            (1, 'Helps_Others', 'Sometimes', 3.0, 'Average'),
+            (2, '', '', None, ''),
+        ])
+
+    def test_sentiment_of_out_of_scope_answers(self):
+        review = create_review(self.form, self.employees[0], self.employees[1])
+        scores = {'neg': 0.0, 'neu': 0.4, 'pos': 0.6, 'compound': 0.64}
+        review.ml_analysis = {
+            self.QUESTIONS[0]: {'category': 'Punctuality', 'confidence': 91.0, 'prediction': 'Always on time'},
+            self.QUESTIONS[1]: {'category': 'Out of Scope', 'confidence': 0.0, 'prediction': str(scores), 'sentiment': 0.64},
+            # Stored before analyses carried the sentiment key
+            self.QUESTIONS[2]: {'category': 'Out of Scope', 'confidence': 0.0, 'prediction': str({**scores, 'compound': -0.3})},
+        }
+
+        store_review_answers([review])
+
+        answers = list(review.answers.order_by('question_index').values_list('prediction', 'score', 'sentiment'))
+        self.assertEqual(answers, [('Always on time', 5.0, None), ('', None, 0.64), ('', None, -0.3)])
+
+    def test_category_report_groups_in_sql(self):
+        reviews = [
+            self.analysed_review(self.employees[0], self.employees[1], 'Always on time', 'Always'),
+            self.analysed_review(self.employees[1], self.employees[0], 'Frequently late', 'Sometimes'),
+        ]
+        store_review_answers(reviews)
+
+        with self.assertNumQueries(1):
+            report = ReviewAnswer.category_report(self.form)
+        self.assertEqual(report, [
+            {'category': 'Helps_Others', 'answers': 2, 'average_score': 4.0},
+            {'category': 'Punctuality', 'answers': 2, 'average_score': 3.5},
+        ])
+
+    def test_backfill_command(self):
+        review = self.analysed_review(self.employees[0], self.employees[1], 'Always on time', 'Always')
+        pending = create_review(self.form, self.employees[1], self.employees[0])
+        PeerReview.objects.filter(id=pending.id).update(ml_status='pending')
+
+        call_command('backfill_review_answers', batch_size=1, stdout=StringIO())
+
+        self.assertEqual(ReviewAnswer.objects.filter(review=review).count(), 3)
+        self.assertFalse(ReviewAnswer.objects.filter(review=pending).exists())
+
+    def test_deleting_a_review_refreshes_the_rollups(self):
+        kept = self.analysed_review(self.employees[0], self.employees[1], 'Always on time', 'Always')
+        removed = self.analysed_review(self.employees[2], self.employees[1], 'Frequently late', 'Never')
+        only = self.analysed_review(self.employees[1], self.employees[0], 'Always on time', 'Always')
+        refresh_score_rollups(self.form.id)
+        self.assertEqual(ScoreRollup.objects.get(employee=self.employees[1]).review_count, 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            removed.delete()
+            only.delete()
+
+        rollup = ScoreRollup.objects.get(employee=self.employees[1])
+        self.assertEqual((rollup.review_count, rollup.overall_score), (1, 5.0))
+        self.assertFalse(ScoreRollup.objects.filter(employee=self.employees[0]).exists())
+        self.assertFalse(ScoreTrendPoint.objects.filter(employee=self.employees[0]).exists())
+        self.assertEqual(kept.reviewee.score_trend.get(category=ScoreTrendPoint.OVERALL).score, 5.0)
+
+        # Deleting the form cascades to its reviews; their refreshes find nothing left to score
+        with self.captureOnCommitCallbacks(execute=True):
+            self.form.delete()
+        self.assertFalse(ScoreRollup.objects.exists())
+
+    def test_admins_only_see_the_trend_of_their_own_forms(self):
+        other_admin = CustomUser.objects.create_user(username='other', password='pass', role='admin')
+        other_form = create_form(other_admin, self.employees, 'Other')
+        later_form = create_form(self.admin, self.employees, 'Later')
+        for form in (self.form, other_form, later_form):
+            self.analysed_review(self.employees[0], self.employees[1], 'Always on time', 'Always', form)
+            refresh_score_rollups(form.id)
+
+        self.client.force_login(self.admin)
+        response = self.client.get(reverse('performance_output', args=[later_form.id, self.employees[1].id]))
+        self.assertEqual(json.loads(response.context['labels_line']), ['Form', 'Later'])
+
+        self.client.force_login(self.employees[1])
+        response = self.client.get(reverse('performance_output', args=[later_form.id, self.employees[1].id]))
+        self.assertEqual(json.loads(response.context['labels_line']), ['Form', 'Other', 'Later'])
+
+
+class ExportReviewsTests(TestCase):
+    def setUp(self):
+        self.admin = CustomUser.objects.create_user(username='admin', password='pass', role='admin')
+        self.employees = [
+            CustomUser.objects.create_user(username=f'employee{i}', password='pass', role='employee')
+            for i in range(3)
+        ]
+        self.form = create_form(self.admin, self.employees)
+        self.review = create_review(self.form, self.employees[0], self.employees[1])
+        self.review.ml_analysis = {
+            'How punctual is this colleague?': {'category': 'Punctuality', 'confidence': 91.5, 'prediction': 'Always on time'}
+        }
+        self.review.save()
+        create_review(self.form, self.employees[1], self.employees[0])
+        self.client.force_login(self.admin)
+
+    def export(self, export_format):
+        response = self.client.get(reverse('export_reviews', args=[self.form.id]), {'format': export_format})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+
+    def test_csv(self):
+        rows = list(csv.DictReader(StringIO(self.export('csv'))))
+
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(rows[0]['reviewer'], 'employee0')
+        self.assertEqual(rows[0]['reviewee'], 'employee1')
+        self.assertEqual(rows[0]['q1_answer'], 'Always on time')
+        self.assertEqual(rows[0]['q1_category'], 'Punctuality')
+        self.assertEqual(rows[0]['q1_confidence'], '91.5')
+        self.assertEqual(rows[1]['q1_prediction'], '')
+
+    def test_jsonl(self):
+        rows = [json.loads(line) for line in self.export('jsonl').splitlines()]
+
+        self.assertEqual([row['review_id'] for row in rows], sorted(row['review_id'] for row in rows))
+        self.assertEqual(rows[0]['q1_prediction'], 'Always on time')
+        self.assertEqual(rows[0]['q1_confidence'], 91.5)
+
+    def test_csv_cells_are_not_formulas(self):
+        question = 'How punctual is this colleague?'
+        PeerReview.objects.filter(id=self.review.id).update(responses={question: '=HYPERLINK("http://x")'})
+        self.review.ml_analysis[question]['confidence'] = -1.0
+        PeerReview.objects.filter(id=self.review.id).update(ml_analysis=self.review.ml_analysis)
+
+        row = next(csv.DictReader(StringIO(self.export('csv'))))
+        self.assertEqual(row['q1_answer'], '\'=HYPERLINK("http://x")')
+        self.assertEqual(row['q1_confidence'], '-1.0')
+
+        row = json.loads(self.export('jsonl').splitlines()[0])
+        self.assertEqual(row['q1_answer'], '=HYPERLINK("http://x")')
+
+    def test_reviews_are_read_in_chunks_of_one_query(self):
+        with self.assertNumQueries(1):
+            rows = list(export_rows(self.form, chunk_size=1))
+        self.assertEqual(len(rows), 2)
+
+    def test_rejects_unknown_format_and_other_admins(self):
+        response = self.client.get(reverse('export_reviews', args=[self.form.id]), {'format': 'xml'})
+        self.assertEqual(response.status_code, 400)
+
+        other = CustomUser.objects.create_user(username='other', password='pass', role='admin')
+        self.client.force_login(other)
+        response = self.client.get(reverse('export_reviews', args=[self.form.id]))
+        self.assertEqual(response.status_code, 404)
+
+    def test_command(self):
+        output = StringIO()
+        call_command('export_reviews', form_id=self.form.id, format='jsonl', stdout=output)
+        self.assertEqual(len(output.getvalue().splitlines()), 2)
+
+
+class SummaryInputHashTests(TestCase):
+    def setUp(self):
+        self.admin = CustomUser.objects.create_user(username='admin', password='pass', role='admin')
+        self.employees = [
+            CustomUser.objects.create_user(username=f'employee{i}', password='pass', role='employee')
+            for i in range(3)
+        ]
+        self.form = create_form(self.admin, self.employees)
+        self.review = create_review(self.form, self.employees[0], self.employees[2])
+        create_review(self.form, self.employees[1], self.employees[2])
+        self.summary = EmployeeSummary.objects.create(
+            employee=self.employees[2],
+            form=self.form,
+            status='ready',
+            gemini_analysis='Always on time.',
+            input_hash=summary_input_hash(build_summary_data(self.employees[2], self.form))
+        )
+
+    def test_hash_ignores_review_order_and_whitespace(self):
+        summary_data = build_summary_data(self.employees[2], self.form)
+        reordered = json.loads(json.dumps(summary_data))
+        reordered['questions'][0]['answers'] = [
+            f'  {answer.replace(" ", "  ")} ' for answer in reversed(reordered['questions'][0]['answers'])
+        ]
+
+        self.assertEqual(summary_input_hash(reordered), summary_input_hash(summary_data))
+
+    def test_unchanged_summary_is_not_requeued(self):
+        self.assertFalse(enqueue_summary(self.summary))
+        self.assertEqual(EmployeeSummary.objects.get(id=self.summary.id).status, 'ready')
+
+    def test_changed_answer_requeues(self):
+        PeerReview.objects.filter(id=self.review.id).update(responses={'How punctual is this colleague?': 'Often late'})
+
+        self.assertTrue(enqueue_summary(self.summary))
+        self.assertEqual(EmployeeSummary.objects.get(id=self.summary.id).status, 'pending')
+
+    def test_new_prompt_version_requeues(self):
+        with mock.patch('evaluation.ml_models.api.PROMPT_VERSION', '2'):
+            self.assertTrue(enqueue_summary(self.summary))
+        self.assertEqual(EmployeeSummary.objects.get(id=self.summary.id).status, 'pending')
+
+
+class SummaryQueueTests(TestCase):
+    def setUp(self):
+        self.admin = CustomUser.objects.create_user(username='admin', password='pass', role='admin')
+        self.employee = CustomUser.objects.create_user(username='employee', password='pass', role='employee')
+        form = create_form(self.admin, [self.employee])
+        self.summary = EmployeeSummary.objects.create(employee=self.employee, form=form, status='running')
+
+    def test_status_change_is_compare_and_set(self):
+        stale_copy = EmployeeSummary.objects.get(id=self.summary.id)
+        self.assertTrue(update_summary_if_status(self.summary, 'running', status='ready'))
+
+        self.assertFalse(update_summary_if_status(stale_copy, 'running', status='failed'))
+        self.assertEqual(stale_copy.status, 'ready')
+
+    def test_enqueue_is_single_flight(self):
+        self.assertFalse(enqueue_summary(self.summary, force=True))
+        self.assertEqual(self.summary.status, 'running')
+
+        update_summary_if_status(self.summary, 'running', status='ready', attempts=2)
+        self.assertTrue(enqueue_summary(self.summary, force=True))
+        summary = EmployeeSummary.objects.get(id=self.summary.id)
+        self.assertEqual((summary.status, summary.attempts), ('pending', 0))
+        self.assertFalse(enqueue_summary(self.summary, force=True))
+
+    def test_claim_takes_only_due_pending_summaries(self):
+        update_summary_if_status(self.summary, 'running', status='pending', run_after=timezone.now() + timedelta(minutes=5))
+        self.assertEqual(claim_summaries(10), [])
+
+        update_summary_if_status(self.summary, 'pending', run_after=timezone.now())
+        self.assertEqual([summary.id for summary in claim_summaries(10)], [self.summary.id])
+        self.assertEqual(claim_summaries(10), [])
+        self.assertEqual(EmployeeSummary.objects.get(id=self.summary.id).status, 'running')
+
+    def test_failed_attempts_back_off_then_give_up(self):
+        before = timezone.now()
+        fail_summary(self.summary, 'timeout', max_attempts=2)
+        self.assertEqual((self.summary.status, self.summary.attempts), ('pending', 1))
+        self.assertAlmostEqual((self.summary.run_after - before).total_seconds(), SUMMARY_RETRY_DELAY, delta=5)
+
+        update_summary_if_status(self.summary, 'pending', status='running')
+        fail_summary(self.summary, 'timeout', max_attempts=2)
+        summary = EmployeeSummary.objects.get(id=self.summary.id)
+        self.assertEqual((summary.status, summary.attempts, summary.last_error), ('failed', 2, 'timeout'))
+
+    def test_stale_running_summaries_are_released(self):
+        self.assertEqual(release_stale_summaries(timeout=900), 0)
+        EmployeeSummary.objects.filter(id=self.summary.id).update(updated_at=timezone.now() - timedelta(minutes=16))
+        self.assertEqual(release_stale_summaries(timeout=900), 1)
+        self.assertEqual(EmployeeSummary.objects.get(id=self.summary.id).status, 'pending')
+
+    def test_analysis_text_is_never_mistaken_for_an_error(self):
+        self.assertTrue(finish_summary(self.summary, '', 'Errors were rare this cycle.', 'hash'))
+        self.assertEqual(EmployeeSummary.objects.get(id=self.summary.id).status, 'ready')
+
+    def test_llm_errors_fail_the_attempt(self):
+        with mock.patch('evaluation.ml_models.api.FileProcessor') as processor:
+            processor.return_value.process_data.side_effect = LLMError('quota')
+            analysis, error = process_with_gemini_api({'name': 'employee', 'questions': []})
+        self.assertIsNone(analysis)
+        self.assertIn('quota', error)
+
+        self.assertFalse(finish_summary(self.summary, '', analysis, 'hash', error=error))
+        summary = EmployeeSummary.objects.get(id=self.summary.id)
+        self.assertEqual((summary.status, summary.attempts, summary.gemini_analysis), ('pending', 1, ''))
+        self.assertIn('quota', summary.last_error)
+
+    def test_legacy_error_analyses_are_requeued(self):
+        EmployeeSummary.objects.filter(id=self.summary.id).update(
+            status='ready', gemini_analysis='Error processing with Gemini API: 429 quota exceeded'
+        )
+        migration = import_module('evaluation.migrations.0014_requeue_error_summaries')
+
+        migration.requeue_error_summaries(apps, None)
+
+        summary = EmployeeSummary.objects.get(id=self.summary.id)
+        self.assertEqual((summary.status, summary.gemini_analysis), ('pending', ''))
+        self.assertIn('429 quota exceeded', summary.last_error)
+
+
+@override_settings(LLM_BACKEND='stub')
+class GenerateSummariesCommandTests(TestCase):
+    def setUp(self):
+        self.admin = CustomUser.objects.create_user(username='admin', password='pass', role='admin')
+        self.employees = [
+            CustomUser.objects.create_user(username=f'employee{i}', password='pass', role='employee')
+            for i in range(3)
+        ]
+        self.form = create_form(self.admin, self.employees)
+        for reviewer in self.employees:
+            for reviewee in self.employees:
+                if reviewer != reviewee:
+                    create_review(self.form, reviewer, reviewee)
+        reset_llm_client()
+        self.addCleanup(reset_llm_client)
+
+    def generate(self, **options):
+        output = StringIO()
+        call_command('generate_summaries', form_id=self.form.id, rate=0, stdout=output, **options)
+        return output.getvalue()
+
+    def test_summaries_queued_by_the_last_review_are_generated(self):
+        # As left by check_and_generate_summary when each employee's last review came in
+        for employee in self.employees[:2]:
+            EmployeeSummary.objects.create(employee=employee, form=self.form)
+
+        output = self.generate()
+
+        self.assertIn('1 newly queued, 2 already pending or running, 0 up to date', output)
+        self.assertIn('Finished: 3 generated, 0 failed', output)
+        self.assertEqual(list(EmployeeSummary.objects.values_list('status', flat=True)), ['ready'] * 3)
+
+        output = self.generate()
+        self.assertIn('0 newly queued, 0 already pending or running, 3 up to date', output)
+        self.assertNotIn('Finished', output)
+
+    def test_running_and_backing_off_summaries_are_left_alone(self):
+        EmployeeSummary.objects.create(employee=self.employees[0], form=self.form, status='running')
+        EmployeeSummary.objects.create(
+            employee=self.employees[1], form=self.form, run_after=timezone.now() + timedelta(minutes=5)
+        )
+
+        output = self.generate()
+
+        self.assertIn('2 summaries are being generated by a running worker or are waiting to retry', output)
+        self.assertIn('Finished: 1 generated, 0 failed', output)
+        self.assertEqual(EmployeeSummary.objects.get(employee=self.employees[1]).status, 'pending')
+
+    def test_generate_all_reports_pending_summaries(self):
+        EmployeeSummary.objects.create(employee=self.employees[0], form=self.form)
+        self.client.force_login(self.admin)
+
+        response = self.client.post(reverse('generate_form_summaries', args=[self.form.id]), follow=True)
+
+        self.assertEqual(
+            [str(message) for message in response.context['messages']],
+            ['2 summaries queued for generation, 1 already waiting for or being generated by the summary worker. 0 up to date.']
+        )
+
+
+@override_settings(SUMMARY_ARCHIVE_ENABLED=True, SUMMARY_ARCHIVE_RETENTION=2, LLM_BACKEND='stub')
+class SummaryArchiveTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        settings_override = override_settings(MEDIA_ROOT=media_root.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.admin = CustomUser.objects.create_user(username='admin', password='pass', role='admin')
+        self.employees = [
+            CustomUser.objects.create_user(username=f'employee{i}', password='pass', role='employee')
+            for i in range(2)
+        ]
+        self.form = create_form(self.admin, self.employees)
+        create_review(self.form, self.employees[1], self.employees[0])
+        self.summary_data = build_summary_data(self.employees[0], self.form)
+        reset_llm_client()
+        self.addCleanup(reset_llm_client)
+
+    def test_archives_are_compressed_and_pruned(self):
+        from django.core.files.storage import default_storage
+
+        names = [archive_summary_data(self.employees[0], self.form, self.summary_data) for i in range(3)]
+
+        directory = f'summaries/{self.form.id}/{self.employees[0].id}'
+        directories, files = default_storage.listdir(directory)
+        self.assertEqual(sorted(f'{directory}/{filename}' for filename in files), names[1:])
+        with default_storage.open(names[-1]) as f:
+            self.assertEqual(json.loads(gzip.decompress(f.read())), self.summary_data)
+
+    def test_storage_errors_do_not_fail_the_summary(self):
+        summary = EmployeeSummary.objects.create(employee=self.employees[0], form=self.form)
+
+        with mock.patch('django.core.files.storage.default_storage.save', side_effect=OSError('disk full')), \
+                self.assertLogs('evaluation.tasks', 'ERROR'):
+            self.assertEqual(archive_summary_data(self.employees[0], self.form, self.summary_data), '')
+            events = list(stream_summary_generation(summary))
+
+        self.assertEqual(events[-1], ('done', {'status': 'ready'}))
+        self.assertEqual(EmployeeSummary.objects.get(id=summary.id).summary_file_path, '')
+
+
+@override_settings(LLM_BACKEND='stub')
+class SummaryStreamTests(TestCase):
+    def setUp(self):
+        self.admin = CustomUser.objects.create_user(username='admin', password='pass', role='admin')
+        self.employees = [
+            CustomUser.objects.create_user(username=f'employee{i}', password='pass', role='employee')
+            for i in range(2)
+        ]
+        form = create_form(self.admin, self.employees)
+        create_review(form, self.employees[1], self.employees[0])
+        self.summary = EmployeeSummary.objects.create(employee=self.employees[0], form=form)
+        # The shared client is built from the overridden settings
+        reset_llm_client()
+        self.addCleanup(reset_llm_client)
+
+    def events(self):
+        return list(stream_summary_generation(self.summary))
+
+    def test_backoff_is_respected(self):
+        EmployeeSummary.objects.filter(id=self.summary.id).update(run_after=timezone.now() + timedelta(minutes=2))
+
+        events = self.events()
+
+        self.assertEqual([event for event, payload in events], ['waiting'])
+        self.assertGreater(events[0][1]['retry_in'], 100)
+        self.assertEqual(EmployeeSummary.objects.get(id=self.summary.id).status, 'pending')
+
+    def test_failed_attempt_reports_the_backoff(self):
+        with mock.patch('evaluation.ml_models.api.FileProcessor.stream_data', side_effect=LLMError('down')):
+            events = self.events()
+
+        event, payload = events[-1]
+        self.assertEqual(event, 'failed')
+        self.assertGreater(payload['retry_in'], 0)
+        self.summary.refresh_from_db()
+        self.assertEqual((self.summary.status, self.summary.attempts), ('pending', 1))
+        # The next page view waits instead of calling the LLM again
+        self.assertEqual([event for event, payload in self.events()], ['waiting'])
+
+    def test_due_summary_is_generated(self):
+        events = self.events()
+        self.assertEqual(events[-1], ('done', {'status': 'ready'}))
+        self.assertIn('chunk', [event for event, payload in events])
+
+    def stream_url(self):
+        return reverse('stream_summary', args=[self.summary.form_id, self.employees[0].id])
+
+    @override_settings(SUMMARY_STREAMING=True)
+    def test_http_stream(self):
+        self.client.force_login(self.admin)
+        response = self.client.get(self.stream_url())
+
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        body = b''.join(response.streaming_content).decode()
+        self.assertIn('event: chunk\n', body)
+        self.assertTrue(body.endswith('event: done\ndata: {"status": "ready"}\n\n'))
+
+    @override_settings(SUMMARY_STREAMING=True)
+    def test_http_stream_is_limited_to_the_form_owner(self):
+        other = CustomUser.objects.create_user(username='other', password='pass', role='admin')
+        self.client.force_login(other)
+
+        self.assertEqual(self.client.get(self.stream_url()).status_code, 403)
+        self.assertEqual(EmployeeSummary.objects.get(id=self.summary.id).status, 'pending')
+
+    @override_settings(SUMMARY_STREAMING=True)
+    def test_disconnect_hands_the_summary_back(self):
+        self.client.force_login(self.admin)
+        response = self.client.get(self.stream_url())
+
+        self.assertTrue(next(iter(response.streaming_content)).startswith(b'event: chunk'))
+        self.assertEqual(EmployeeSummary.objects.get(id=self.summary.id).status, 'running')
+        response.close()
+
+        self.assertEqual(EmployeeSummary.objects.get(id=self.summary.id).status, 'pending')
+
+    @override_settings(SUMMARY_STREAMING=False)
+    def test_http_stream_can_be_disabled(self):
+        self.client.force_login(self.admin)
+        self.assertEqual(self.client.get(self.stream_url()).status_code, 404)
+
+
+class SummaryHtmlTests(TestCase):
+    def setUp(self):
+        self.admin = CustomUser.objects.create_user(username='admin', password='pass', role='admin')
+        self.employee = CustomUser.objects.create_user(username='employee', password='pass', role='employee')
+        form = create_form(self.admin, [self.employee])
+        self.summary = EmployeeSummary.objects.create(employee=self.employee, form=form, status='running')
+
+    def test_html_is_rendered_when_the_analysis_is_stored(self):
+        finish_summary(self.summary, '', '## Strengths\n\n<script>alert(1)</script>**Punctual**', 'hash')
+
+        summary = EmployeeSummary.objects.get(id=self.summary.id)
+        self.assertIn('<h2>Strengths</h2>', summary.analysis_html)
+        self.assertIn('<strong>Punctual</strong>', summary.analysis_html)
+        self.assertNotIn('<script>', summary.analysis_html)
+        with self.assertNumQueries(0):
+            self.assertEqual(summary.rendered_analysis(), summary.analysis_html)
+
+    def test_html_is_rendered_again_when_the_whitelist_changes(self):
+        finish_summary(self.summary, '', '## Strengths', 'hash')
+        markdownify_settings = {'default': {**settings.MARKDOWNIFY['default'], 'WHITELIST_TAGS': ['p'], 'STRIP': True}}
+
+        with self.settings(MARKDOWNIFY=markdownify_settings):
+            html = EmployeeSummary.objects.get(id=self.summary.id).rendered_analysis()
+            self.assertEqual(html, 'Strengths')
+            self.assertEqual(EmployeeSummary.objects.get(id=self.summary.id).analysis_html, 'Strengths')
+
+
+@skipUnless(connection.vendor == 'sqlite', 'Query plans are checked against SQLite')
+class QueryPlanTests(TestCase):
+    def setUp(self):
+        self.admin = CustomUser.objects.create_user(username='admin', password='pass', role='admin')
+        self.employee = CustomUser.objects.create_user(username='employee', password='pass', role='employee')
+        self.form = create_form(self.admin, [self.employee])
+
+    def assertUsesIndex(self, queryset, index_name):
+        plan = queryset.explain()
+        self.assertIn(f'USING INDEX {index_name}', plan)
+        self.assertNotIn('USE TEMP B-TREE', plan)
+
+    def test_reviews_received_on_form(self):
+        self.assertUsesIndex(
+            PeerReview.objects.filter(form=self.form, reviewee=self.employee),
+            'peerreview_form_reviewee_idx'
+        )
+
+    def test_forms_created_by_admin_newest_first(self):
+        self.assertUsesIndex(
+            EvaluationForm.objects.filter(created_by=self.admin).order_by('-created_at'),
+            'form_owner_created_idx'
+        )
+
+    def test_users_by_role(self):
+        self.assertUsesIndex(CustomUser.objects.filter(role='employee'), 'user_role_idx')
@@ -11,9 +11,12 @@ urlpatterns = [
     path('admin-dashboard/', views.admin_dashboard, name='admin_dashboard'),
     path('create-form/', views.create_form, name='create_form'),
     path('view-reviews/<int:form_id>/', views.view_reviews, name='view_reviews'),
+    path('view-reviews/<int:form_id>/<int:reviewee_id>/', views.reviewee_reviews, name='reviewee_reviews'),
+    path('export-reviews/<int:form_id>/', views.export_reviews, name='export_reviews'),
     path('admin-summaries/<int:form_id>/', views.admin_summaries_list, name='admin_summaries_list'),
     path('admin-summary/<int:form_id>/<int:employee_id>/', views.admin_employee_summary, name='admin_employee_summary'),
     path('refresh-summary/<int:form_id>/<int:employee_id>/', views.refresh_employee_summary, name='refresh_employee_summary'),
+    path('generate-summaries/<int:form_id>/', views.generate_form_summaries, name='generate_form_summaries'),
     
     # Employee paths
     path('employee-dashboard/', views.employee_dashboard, name='employee_dashboard'),
@@ -21,6 +24,7 @@ urlpatterns = [
     path('my-summary/<int:form_id>/', views.my_summary, name='my_summary'),
     path('refresh-my-summary/<int:form_id>/', views.refresh_my_summary, name='refresh_my_summary'),  # Add this line
     
+    path('summary-stream/<int:form_id>/<int:employee_id>/', views.stream_summary, name='stream_summary'),
     path('output/<int:form_id>/<int:employee_id>/', views.performance_output, name='performance_output'),
     path('my-output/<int:form_id>/', views.my_output, name='my_output'),
 
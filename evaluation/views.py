@@ -2,19 +2,26 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib import messages
-from django.http import JsonResponse, HttpResponseForbidden
+from django.http import Http404, JsonResponse, HttpResponseForbidden, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
-from django.db import IntegrityError
+from django.db import IntegrityError, transaction
+from django.db.models import BooleanField, Count, ExpressionWrapper, Prefetch, Q, Sum
+from django.db.models.functions import Coalesce
 from .models import CustomUser, EvaluationForm, EvaluationResponse, PeerReview, EmployeeSummary 
 import json
+import logging
 import traceback
 import os
 from django.conf import settings
 from django.utils import timezone 
 from .models import *
+from .dashboard_cache import cached_payload, reviews_key, ADMIN_DASHBOARD, EMPLOYEE_DASHBOARD, FORM_REVIEWS
+from .tasks import enqueue_ml_analysis, enqueue_summary, queue_form_summaries, stream_summary_generation
 from dotenv import load_dotenv
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 
 def landing_page(request):
     return render(request, 'evaluation/landing_page.html')
@@ -79,36 +86,50 @@ def logout_view(request):
 def is_admin(user):
     return user.is_authenticated and user.role == 'admin'
 
-@user_passes_test(is_admin)
-def admin_dashboard(request):
-    forms = EvaluationForm.objects.filter(created_by=request.user).order_by('-created_at')
-    employees = CustomUser.objects.filter(role='employee')
-    
+def build_admin_dashboard(admin):
+    """Context of the admin dashboard, cached until one of the admin's forms or reviews changes"""
+    # One query for every form and its totals, summed from the per-employee ReviewProgress rows
+    forms = (
+        EvaluationForm.objects
+        .filter(created_by=admin)
+        .annotate(
+            assigned_count=Count('review_progress'),
+            expected_count=Coalesce(Sum('review_progress__expected'), 0),
+            completed_count=Coalesce(Sum('review_progress__completed'), 0)
+        )
+        .order_by('-created_at')
+    )
     # Calculate statistics
-    total_reviews = PeerReview.objects.filter(form__created_by=request.user).count()
+    total_reviews = 0
     pending_reviews = 0
     
     # Calculate expected vs completed reviews for each form
     forms_with_stats = []
     for form in forms:
-        assigned_count = form.assigned_employees.count()
-        expected_reviews_count = assigned_count * (assigned_count - 1) if assigned_count > 1 else 0
-        completed_reviews = PeerReview.objects.filter(form=form).count()
+        expected_reviews_count = form.expected_count
+        completed_reviews = form.completed_count
         
         forms_with_stats.append({
             'form': form,
+            'assigned_employees': form.assigned_count,
             'expected_reviews': expected_reviews_count,
             'completed_reviews': completed_reviews
         })
         
+        total_reviews += completed_reviews
         pending_reviews += expected_reviews_count - completed_reviews
     
-    return render(request, 'evaluation/admin_dashboard.html', {
+    return {
         'forms_with_stats': forms_with_stats,
-        'employees': employees,
+        'employee_count': CustomUser.objects.filter(role='employee').count(),
         'total_reviews': total_reviews,
         'pending_reviews': pending_reviews
-    })
+    }
+
+@user_passes_test(is_admin)
+def admin_dashboard(request):
+    context = cached_payload(ADMIN_DASHBOARD, request.user.id, lambda: build_admin_dashboard(request.user))
+    return render(request, 'evaluation/admin_dashboard.html', context)
 
 @user_passes_test(is_admin)
 def create_form(request):
@@ -120,6 +141,15 @@ def create_form(request):
         assigned_employee_ids = request.POST.getlist('assigned_employees')
         
         questions = [{'text': q.strip()} for q in questions_raw.strip().split('\n') if q.strip()]
+
+        # Categories depend only on the question text, so classify once here instead of per review
+        try:
+            from .ml_models.analysis import classify_questions
+            classify_questions(questions)
+        except Exception:
+            logger.exception('Question classification failed, reviews will classify on the fly')
+            messages.warning(request, 'Questions could not be categorised now; they will be categorised as reviews come in.')
+
         form = EvaluationForm.objects.create(
             title=title,
             description=description,
@@ -135,62 +165,124 @@ def create_form(request):
     
     return render(request, 'evaluation/create_form.html', {'employees': employees})
 
+# Reviewees shown per page of view_reviews; their reviews are loaded on demand
+REVIEWEES_PER_PAGE = 10
+
 @user_passes_test(is_admin)
 def view_reviews(request, form_id):
     form = get_object_or_404(EvaluationForm, id=form_id, created_by=request.user)
-    reviews = PeerReview.objects.filter(form=form).select_related('reviewer', 'reviewee')
-    
-    # Organize reviews by reviewee
-    reviews_by_reviewee = {}
-    for review in reviews:
-        if review.reviewee.id not in reviews_by_reviewee:
-            reviews_by_reviewee[review.reviewee.id] = {
-                'reviewee': review.reviewee,
-                'reviews': []
-            }
-        reviews_by_reviewee[review.reviewee.id]['reviews'].append(review)
+    try:
+        after = int(request.GET.get('after', 0))
+    except ValueError:
+        after = 0
+    
+    # Keyset page of reviewees with review counts, read from the (form, reviewee) index
+    # without loading any review JSON
+    page = list(
+        PeerReview.objects
+        .filter(form=form, reviewee_id__gt=after)
+        .values('reviewee_id')
+        .annotate(review_count=Count('id'))
+        .order_by('reviewee_id')[:REVIEWEES_PER_PAGE + 1]
+    )
+    has_next = len(page) > REVIEWEES_PER_PAGE
+    page = page[:REVIEWEES_PER_PAGE]
+    reviewees = CustomUser.objects.in_bulk([row['reviewee_id'] for row in page])
     
     return render(request, 'evaluation/view_reviews.html', {
         'form': form,
-        'reviews_by_reviewee': reviews_by_reviewee
+        'reviewees': [
+            {'reviewee': reviewees[row['reviewee_id']], 'review_count': row['review_count']}
+            for row in page
+        ],
+        'next_after': page[-1]['reviewee_id'] if has_next else None,
+        'is_first_page': after == 0
     })
 
+@user_passes_test(is_admin)
+def export_reviews(request, form_id):
+    """Download every review of a form as CSV or JSONL, streamed in chunks"""
+    from .exports import EXPORT_FORMATS, stream_export
+    
+    form = get_object_or_404(EvaluationForm, id=form_id, created_by=request.user)
+    export_format = request.GET.get('format', 'csv')
+    if export_format not in EXPORT_FORMATS:
+        return JsonResponse({'error': f'format must be one of {", ".join(EXPORT_FORMATS)}'}, status=400)
+    
+    content_type = 'text/csv' if export_format == 'csv' else 'application/x-ndjson'
+    response = StreamingHttpResponse(stream_export(form, export_format), content_type=f'{content_type}; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="form-{form.id}-reviews.{export_format}"'
+    return response
+
+@user_passes_test(is_admin)
+def reviewee_reviews(request, form_id, reviewee_id):
+    """The reviews one employee received on a form, as an HTML fragment for view_reviews"""
+    form = get_object_or_404(EvaluationForm, id=form_id, created_by=request.user)
+    reviews = cached_payload(
+        FORM_REVIEWS,
+        reviews_key(form.id, reviewee_id),
+        lambda: list(
+            PeerReview.objects
+            .filter(form=form, reviewee_id=reviewee_id)
+            .select_related('reviewer')
+            .order_by('submitted_at')
+        )
+    )
+    
+    return render(request, 'evaluation/reviewee_reviews.html', {'reviews': reviews})
+
 # Employee views
 def is_employee(user):
     return user.is_authenticated and user.role == 'employee'
 
-@user_passes_test(is_employee)
-def employee_dashboard(request):
-    # Get forms where user is assigned
-    assigned_forms = EvaluationForm.objects.filter(
-        assigned_employees=request.user,
-        is_active=True
+def build_employee_dashboard(employee):
+    """Context of an employee's dashboard, cached until their forms, colleagues or reviews change"""
+    # Get forms where user is assigned, with every form's assignees in one extra query
+    assigned_forms = list(
+        EvaluationForm.objects
+        .filter(assigned_employees=employee, is_active=True)
+        .prefetch_related('assigned_employees')
     )
     
+    # Every (form, reviewee) pair this user has already reviewed, in one query
+    reviewed_by_form = {}
+    for form_id, reviewee_id in PeerReview.objects.filter(
+        form__in=assigned_forms,
+        reviewer=employee
+    ).values_list('form_id', 'reviewee_id'):
+        reviewed_by_form.setdefault(form_id, set()).add(reviewee_id)
+    
     # For each form, get colleagues to review
     forms_with_colleagues = []
     for form in assigned_forms:
-        colleagues = form.assigned_employees.exclude(id=request.user.id)
-        reviewed_colleagues = PeerReview.objects.filter(
-            form=form,
-            reviewer=request.user
-        ).values_list('reviewee_id', flat=True)
+        colleagues = [colleague for colleague in form.assigned_employees.all() if colleague.id != employee.id]
+        reviewed_colleagues = reviewed_by_form.get(form.id, set())
         
-        pending_colleagues = colleagues.exclude(id__in=reviewed_colleagues)
+        pending_colleagues = [colleague for colleague in colleagues if colleague.id not in reviewed_colleagues]
         
         forms_with_colleagues.append({
             'form': form,
-            'total_colleagues': colleagues.count(),
+            'total_colleagues': len(colleagues),
             'reviewed_count': len(reviewed_colleagues),
             'pending_colleagues': pending_colleagues
         })
     
-    completed_reviews = PeerReview.objects.filter(reviewer=request.user)
+    completed_reviews = list(
+        PeerReview.objects
+        .filter(reviewer=employee)
+        .select_related('form', 'reviewee')
+        .defer('responses', 'ml_analysis', 'form__questions')
+    )
     
-    return render(request, 'evaluation/employee_dashboard.html', {
+    return {
         'forms_with_colleagues': forms_with_colleagues,
         'completed_reviews': completed_reviews
-    })
+    }
+
+@user_passes_test(is_employee)
+def employee_dashboard(request):
+    context = cached_payload(EMPLOYEE_DASHBOARD, request.user.id, lambda: build_employee_dashboard(request.user))
+    return render(request, 'evaluation/employee_dashboard.html', context)
 
 @user_passes_test(is_employee)
 def review_colleague(request, form_id, colleague_id):
@@ -214,46 +306,21 @@ def review_colleague(request, form_id, colleague_id):
 
     if request.method == 'POST':
         responses = {}
-        ml_analysis = {}
 
-        # Process each question and run ML analysis
         for i, question in enumerate(form.questions):
             answer = request.POST.get(f"question_{i}", '')
             responses[question['text']] = answer
 
-            # Run ML analysis
-            try:
-                from .ml_models.qpsvc import QuestionClassifier
-                from .ml_models.genprocess import Brain
-
-                classifier = QuestionClassifier()
-                brain = Brain()
-
-                category, confidence = classifier.classify(question['text'])
-
-                if category != "Out of Scope":
-                    prediction = brain.brain(category, answer)
-                else:
-                    prediction = brain.brain("Out of Scope", answer)
-
-                ml_analysis[question['text']] = {
-                    'category': category,
-                    'confidence': float(confidence),
-                    'prediction': str(prediction)
-                }
-            except Exception as e:
-                ml_analysis[question['text']] = {
-                    'error': str(e)
-                }
-
-        # Create peer review
-        PeerReview.objects.create(
-            form=form,
-            reviewer=request.user,
-            reviewee=colleague,
-            responses=responses,
-            ml_analysis=ml_analysis
-        )
+        # Create peer review; ML analysis is filled in by the run_ml_worker command
+        with transaction.atomic():
+            review = PeerReview.objects.create(
+                form=form,
+                reviewer=request.user,
+                reviewee=colleague,
+                responses=responses,
+                ml_status='pending'
+            )
+            enqueue_ml_analysis(review)
 
         messages.success(request, f'Review for {colleague.username} submitted successfully!')
         
@@ -305,92 +372,19 @@ def evaluate_response(request):
 
     return JsonResponse({'error': 'Method not allowed'}, status=405) 
 
-def generate_summary_file(employee, form):
-    """Generate summary file for employee based on all peer reviews"""
-    
-    # Get all reviews for this employee on this form
-    reviews = PeerReview.objects.filter(reviewee=employee, form=form)
-    
-    if not reviews.exists():
-        return None
-    
-    # Create summary data in format like your examples
-    summary_data = {
-        "name": employee.username,
-        "questions": []
-    }
-    
-    # Organize answers by question
-    for question in form.questions:
-        question_data = {
-            "question": question['text'],
-            "answers": []
-        }
-        
-        # Collect all answers for this question from different reviewers
-        for review in reviews:
-            if question['text'] in review.responses:
-                answer = review.responses[question['text']]
-                reviewer_name = review.reviewer.username
-                question_data['answers'].append(f"{answer} (by {reviewer_name})")
-        
-        summary_data['questions'].append(question_data)
-    
-    # Create summaries directory if it doesn't exist
-    summaries_dir = os.path.join(settings.BASE_DIR, 'evaluation', 'summaries')
-    os.makedirs(summaries_dir, exist_ok=True)
-    
-    # Save to JSON file
-    filename = f"{employee.username}_{form.id}_summary.json"
-    file_path = os.path.join(summaries_dir, filename)
-    
-    with open(file_path, 'w') as f:
-        json.dump(summary_data, f, indent=2)
-    
-    return file_path
-
-def process_with_gemini_api(file_path):
-    """Process summary file with Gemini API"""
-    try:
-        from .ml_models.api import FileProcessor
-        processor = FileProcessor()
-        analysis = processor.process_new_file(file_path)
-        return analysis
-    except Exception as e:
-        return f"Error processing with Gemini API: {str(e)}"
-
 def check_and_generate_summary(employee, form):
-    """Check if all reviews are complete and generate summary"""
+    """Check if all reviews are complete and queue the summary for generation"""
     
     # Check if all expected reviews are completed
-    assigned_employees = form.assigned_employees.all()
-    expected_reviewers = assigned_employees.exclude(id=employee.id)
+    progress = ReviewProgress.objects.filter(form=form, reviewee=employee).first()
     
-    completed_reviews = PeerReview.objects.filter(
-        form=form, 
-        reviewee=employee,
-        reviewer__in=expected_reviewers
-    ).count()
-    
-    if completed_reviews == expected_reviewers.count() and completed_reviews > 0:
-        # All reviews completed, generate summary
+    if progress and progress.is_complete:
+        # All reviews completed; a new summary row is queued for run_summary_worker.
+        # get_or_create recovers from the unique (employee, form) race by re-reading the row.
         summary, created = EmployeeSummary.objects.get_or_create(
             employee=employee,
             form=form
         )
-        
-        if created or not summary.gemini_analysis:
-            # Generate new summary file
-            file_path = generate_summary_file(employee, form)
-            if file_path:
-                # Process with Gemini API
-                analysis = process_with_gemini_api(file_path)
-                
-                # Save results
-                summary.summary_file_path = file_path
-                summary.gemini_analysis = analysis
-                summary.save()
-        
         return summary
     
     return None
@@ -415,7 +409,8 @@ def my_summary(request, form_id):
     return render(request, 'evaluation/my_summary.html', {
         'summary': summary,
         'form': form,
-        'employee': request.user
+        'employee': request.user,
+        'streaming': settings.SUMMARY_STREAMING
     })
 
 @user_passes_test(is_admin)
@@ -440,7 +435,8 @@ def admin_employee_summary(request, form_id, employee_id):
         return render(request, 'evaluation/employee_summary.html', {
             'summary': summary,
             'form': form,
-            'employee': employee
+            'employee': employee,
+            'streaming': settings.SUMMARY_STREAMING
         })
     except Exception as e:
         print(f"ERROR: {str(e)}")
@@ -454,19 +450,38 @@ def admin_summaries_list(request, form_id):
     """Admin view to see list of all employee summaries for a form"""
     form = get_object_or_404(EvaluationForm, id=form_id, created_by=request.user)
     
+    # A pure read: generation is only ever started by the admin's Generate/Retry actions.
+    # One query for the employees with their review progress, one for their summaries.
+    employees = (
+        form.assigned_employees
+        .annotate(
+            reviews_completed=Coalesce(Sum('review_progress__completed', filter=Q(review_progress__form=form)), 0),
+            reviews_expected=Coalesce(Sum('review_progress__expected', filter=Q(review_progress__form=form)), 0)
+        )
+        .prefetch_related(Prefetch(
+            'employeesummary_set',
+            queryset=(
+                EmployeeSummary.objects
+                .filter(form=form)
+                .defer('gemini_analysis', 'analysis_html', 'summary_file_path')
+                .annotate(has_analysis=ExpressionWrapper(~Q(gemini_analysis=''), output_field=BooleanField()))
+            ),
+            to_attr='form_summaries'
+        ))
+    )
+    
     # Get all assigned employees and their summary status
     employees_data = []
-    for employee in form.assigned_employees.all():
-        summary = EmployeeSummary.objects.filter(employee=employee, form=form).first()
-        
-        # Check if summary can be generated
-        if not summary:
-            summary = check_and_generate_summary(employee, form)
+    for employee in employees:
+        summary = employee.form_summaries[0] if employee.form_summaries else None
         
         employees_data.append({
             'employee': employee,
             'summary': summary,
-            'has_summary': bool(summary and summary.gemini_analysis)
+            'has_summary': bool(summary and summary.has_analysis),
+            'reviews_completed': employee.reviews_completed,
+            'expected_reviews': employee.reviews_expected,
+            'reviews_complete': employee.reviews_expected > 0 and employee.reviews_completed >= employee.reviews_expected
         })
     
     return render(request, 'evaluation/admin_summaries_list.html', {
@@ -474,6 +489,24 @@ def admin_summaries_list(request, form_id):
         'employees_data': employees_data
     })
 
+@user_passes_test(is_admin)
+def generate_form_summaries(request, form_id):
+    """Admin queues every ready summary of a form for the background worker"""
+    form = get_object_or_404(EvaluationForm, id=form_id, created_by=request.user)
+    
+    if request.method == 'POST':
+        queued, generating, up_to_date = queue_form_summaries(form)
+        if queued or generating:
+            messages.success(
+                request,
+                f'{len(queued)} summaries queued for generation, {len(generating)} already waiting for '
+                f'or being generated by the summary worker. {len(up_to_date)} up to date.'
+            )
+        else:
+            messages.info(request, 'All summaries are up to date.')
+    
+    return redirect('admin_summaries_list', form_id=form.id)
+
 @user_passes_test(is_admin)
 def refresh_employee_summary(request, form_id, employee_id):
     """Admin can refresh/regenerate employee summary"""
@@ -481,30 +514,22 @@ def refresh_employee_summary(request, form_id, employee_id):
     employee = get_object_or_404(CustomUser, id=employee_id, role='employee')
     
     try:
-        # Get existing summary or create new one
-        summary, created = EmployeeSummary.objects.get_or_create(
-            employee=employee,
-            form=form
-        )
-        
-        # Force regeneration
-        file_path = generate_summary_file(employee, form)
-        if file_path:
-            # Process with Gemini API
-            analysis = process_with_gemini_api(file_path)
-            
-            # Save results
-            summary.summary_file_path = file_path
-            summary.gemini_analysis = analysis
-            summary.generated_at = timezone.now()  # Update timestamp
-            summary.save()
-            
-            if "Error processing with Gemini API" in analysis:
-                messages.warning(request, f'Summary refreshed but API error occurred. Please try again.')
-            else:
-                messages.success(request, f'Summary for {employee.username} has been refreshed successfully!')
+        if not PeerReview.objects.filter(reviewee=employee, form=form).exists():
+            messages.error(request, 'Could not generate summary. Please ensure all reviews are completed.')
         else:
-            messages.error(request, 'Could not generate summary file. Please ensure all reviews are completed.')
+            # Get existing summary or create new one, then queue regeneration
+            summary, created = EmployeeSummary.objects.get_or_create(
+                employee=employee,
+                form=form
+            )
+            # Unchanged reviews reuse the cached analysis unless the admin forces a new one
+            force = request.GET.get('force') == '1'
+            if enqueue_summary(summary, force=force) or created:
+                messages.success(request, f'Summary for {employee.username} is being regenerated. This page will update when it is ready.')
+            elif summary.is_generating:
+                messages.info(request, f'Summary for {employee.username} is already being generated.')
+            else:
+                messages.info(request, f'Summary for {employee.username} is already up to date with the latest reviews.')
     
     except Exception as e:
         messages.error(request, f'Error refreshing summary: {str(e)}')
@@ -522,31 +547,53 @@ def refresh_my_summary(request, form_id):
     
     # Same logic as admin refresh but for current user
     try:
-        summary, created = EmployeeSummary.objects.get_or_create(
-            employee=request.user,
-            form=form
-        )
-        
-        file_path = generate_summary_file(request.user, form)
-        if file_path:
-            analysis = process_with_gemini_api(file_path)
-            summary.summary_file_path = file_path
-            summary.gemini_analysis = analysis
-            summary.generated_at = timezone.now()
-            summary.save()
-            
-            if "Error processing with Gemini API" in analysis:
-                messages.warning(request, 'Summary refreshed but API error occurred. Please try again.')
-            else:
-                messages.success(request, 'Your performance summary has been refreshed successfully!')
+        if not PeerReview.objects.filter(reviewee=request.user, form=form).exists():
+            messages.error(request, 'Could not generate summary.')
         else:
-            messages.error(request, 'Could not generate summary file.')
+            summary, created = EmployeeSummary.objects.get_or_create(
+                employee=request.user,
+                form=form
+            )
+            if enqueue_summary(summary) or created:
+                messages.success(request, 'Your performance summary is being regenerated. This page will update when it is ready.')
+            elif summary.is_generating:
+                messages.info(request, 'Your performance summary is already being generated.')
+            else:
+                messages.info(request, 'Your performance summary is already up to date with the latest reviews.')
     
     except Exception as e:
         messages.error(request, f'Error refreshing summary: {str(e)}')
     
     return redirect('my_summary', form_id=form.id)
 
+@login_required
+def stream_summary(request, form_id, employee_id):
+    """Server-sent events feed that generates a queued summary and streams its Markdown as it arrives"""
+    # Off unless the server runs threaded or async workers, see SUMMARY_STREAMING
+    if not settings.SUMMARY_STREAMING:
+        raise Http404('Summary streaming is disabled')
+
+    form = get_object_or_404(EvaluationForm, id=form_id)
+    employee = get_object_or_404(CustomUser, id=employee_id, role='employee')
+    
+    # Same access rules as the summary pages
+    if request.user.role == 'admin':
+        if form.created_by != request.user:
+            return HttpResponseForbidden()
+    elif request.user != employee or request.user not in form.assigned_employees.all():
+        return HttpResponseForbidden()
+    
+    summary = get_object_or_404(EmployeeSummary, employee=employee, form=form)
+    
+    def events():
+        for event, payload in stream_summary_generation(summary):
+            yield f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+    
+    response = StreamingHttpResponse(events(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # Keep proxies from buffering the stream
+    return response
+
 @login_required
 def performance_output(request, form_id, employee_id):
     """Shared performance output page for both admins and employees"""
@@ -567,34 +614,16 @@ def performance_output(request, form_id, employee_id):
             messages.error(request, 'You are not assigned to this form.')
             return redirect('employee_dashboard')
     
-    # Get all reviews for this employee and form
-    reviews = PeerReview.objects.filter(reviewee=employee, form=form)
-    
-    # Calculate ML rating distribution
-    rating_counts = {'Excellent': 0, 'Good': 0, 'Average': 0, 'Needs Improvement': 0}
-    total_answers = 0
-    total_score = 0
-    
-    for review in reviews:
-        try:
-            # FIXED: Use correct field name
-            answers = json.loads(review.review_data)
-            for answer_data in answers:
-                if 'ml_rating' in answer_data:
-                    rating = answer_data['ml_rating']
-                    if rating in rating_counts:
-                        rating_counts[rating] += 1
-                    total_answers += 1
-                    
-                    # Calculate score (Excellent=5, Good=4, Average=3, Needs Improvement=2)
-                    score_map = {'Excellent': 5, 'Good': 4, 'Average': 3, 'Needs Improvement': 2}
-                    total_score += score_map.get(rating, 0)
-        except Exception as e:
-            print(f"Error processing review: {e}")
-            continue
-    
-    # Calculate overall score
-    overall_score = (total_score / total_answers) if total_answers > 0 else 0
+    from .ml_models.scoring import RATING_LABELS
+
+    # Scores are aggregated by the ML worker as reviews are analysed; this page only reads them
+    rollup = ScoreRollup.objects.filter(form=form, employee=employee).first() or ScoreRollup()
+    rating_counts = {label: rollup.rating_counts.get(label, 0) for label in RATING_LABELS}
+    overall_score = rollup.overall_score
+    total_answers = rollup.answer_count
+    category_scores = sorted(
+        (category.replace('_', ' '), score) for category, score in rollup.category_scores.items()
+    )
     
     # Get or create summary for Gemini conclusion
     try:
@@ -607,21 +636,28 @@ def performance_output(request, form_id, employee_id):
     labels_pie = list(rating_counts.keys())
     data_pie = list(rating_counts.values())
     
-    # Mock growth data (replace with actual historical data)
-    labels_line = ['Review 1', 'Review 2', 'Review 3', 'Review 4', 'Current']
-    data_line = [3.0, 3.2, 3.5, 3.8, max(overall_score, 1.0)]
+    # Overall score on every form up to this one, from the trend store; admins only see their own forms
+    trend = ScoreTrendPoint.trend(
+        employee,
+        until=form.created_at,
+        created_by=request.user if request.user.role == 'admin' else None
+    )
+    labels_line = [title for title, score in trend]
+    data_line = [score for title, score in trend]
     
     context = {
         'employee': employee,
         'form': form,
-        'total_reviews': reviews.count(),
+        'total_reviews': PeerReview.objects.filter(reviewee=employee, form=form).count(),
         'overall_score': overall_score,
         'total_answers': total_answers,
         'excellent_count': rating_counts['Excellent'],
         'improvement_areas': rating_counts['Needs Improvement'],
+        'category_scores': category_scores,
         'labels_pie': json.dumps(labels_pie),
         'data_pie': json.dumps(data_pie),
-        'labels_line': json.dumps(labels_line),
+        # Form titles are free text rendered inside <script>, so escape anything that could close it
+        'labels_line': json.dumps(labels_line).translate({ord('<'): '\\u003c', ord('>'): '\\u003e', ord('&'): '\\u0026'}),
         'data_line': json.dumps(data_line),
         'gemini_conclusion': gemini_conclusion,
     }
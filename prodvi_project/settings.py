@@ -192,6 +192,46 @@ AUTHENTICATION_BACKENDS = [
 GEMINI_API_KEY = os.environ.get('GEMINI_API_KEY')
 API_KEY = os.environ.get('GEMINI_API_KEY')
 
+# Trained ML model artifacts (written by `python manage.py train_models`)
+ML_ARTIFACT_DIR = os.environ.get('ML_ARTIFACT_DIR', os.path.join(BASE_DIR, 'evaluation', 'ml_models', 'artifacts'))
+ML_MODEL_VERSION = os.environ.get('ML_MODEL_VERSION')  # None serves the latest trained version
+ML_PIPELINE_CACHE_SIZE = int(os.environ.get('ML_PIPELINE_CACHE_SIZE', 16))  # Fitted category pipelines kept per worker
+
+# LLM client used for performance summaries. LLM_BACKEND=stub gives deterministic offline output for CI and load tests.
+LLM_BACKEND = os.environ.get('LLM_BACKEND', 'gemini')
+LLM_MODEL = os.environ.get('LLM_MODEL', 'gemini-2.5-flash')
+LLM_TIMEOUT = float(os.environ.get('LLM_TIMEOUT', 60))  # Seconds per call
+LLM_MAX_RETRIES = int(os.environ.get('LLM_MAX_RETRIES', 2))
+LLM_CIRCUIT_FAILURES = int(os.environ.get('LLM_CIRCUIT_FAILURES', 5))  # Consecutive failures before failing fast
+LLM_CIRCUIT_RESET = float(os.environ.get('LLM_CIRCUIT_RESET', 60))  # Seconds before a trial call is let through
+LLM_STUB_LATENCY = float(os.environ.get('LLM_STUB_LATENCY', 0))  # Simulated seconds per stub call
+
+# Concurrent LLM calls made by `run_summary_worker` and `generate_summaries`
+SUMMARY_WORKER_THREADS = int(os.environ.get('SUMMARY_WORKER_THREADS', 4))
+SUMMARY_RATE_PER_MINUTE = float(os.environ.get('SUMMARY_RATE_PER_MINUTE', 30))  # Client-side LLM rate limit
+# Summary pages generate queued summaries in the browser's request and stream them as they are written.
+# Each stream holds a worker for the whole generation, so only enable it with a threaded or async
+# server (e.g. gunicorn --worker-class gthread); otherwise run_summary_worker generates them.
+SUMMARY_STREAMING = os.environ.get('SUMMARY_STREAMING', 'false').lower() == 'true'
+# Review data over this many (estimated) tokens is deduped, then condensed per question before the final prompt
+SUMMARY_PROMPT_TOKEN_BUDGET = int(os.environ.get('SUMMARY_PROMPT_TOKEN_BUDGET', 8000))
+SUMMARY_MAP_CONCURRENCY = int(os.environ.get('SUMMARY_MAP_CONCURRENCY', 4))  # Parallel condensing calls per summary
+# Prompts are built in memory; optionally keep gzipped copies of their input in default storage for auditing
+SUMMARY_ARCHIVE_ENABLED = os.environ.get('SUMMARY_ARCHIVE_ENABLED', 'false').lower() == 'true'
+SUMMARY_ARCHIVE_RETENTION = int(os.environ.get('SUMMARY_ARCHIVE_RETENTION', 5))  # Archives kept per employee and form
+
+# Dashboard payloads are cached per user and form, and dropped when reviews, forms or assignments change.
+# Web and worker processes all invalidate entries, so the cache must be shared between them: a file-based
+# cache on the local disk by default. A per-process cache (e.g. LocMemCache) would keep serving stale pages.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('CACHE_DIR', os.path.join(BASE_DIR, 'cache')),
+        'OPTIONS': {'MAX_ENTRIES': 5000},
+    }
+}
+DASHBOARD_CACHE_TIMEOUT = int(os.environ.get('DASHBOARD_CACHE_TIMEOUT', 300))  # Seconds; 0 disables the cache
+
 # Markdownify configuration
 MARKDOWNIFY = {
     "default": {